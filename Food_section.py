@@ -4,7 +4,8 @@ import pandas as pd
 from datetime import date, timedelta
 import plotly.express as px
 from typing import List, Optional
-from frontend_utils import fetch_data, post_data, update_data, delete_data, clear_caches
+from urllib.parse import urlencode
+from frontend_utils import fetch_data, post_data, update_data, delete_data, clear_caches, indice_catalogo
 
 # Sección: Alimentos
 def seccion_alimentos():
@@ -31,7 +32,9 @@ def seccion_alimentos():
                 st.session_state.filtro_alimentos = ""
 
             # Cargar alimentos desde la API
-            alimentos = fetch_data("/foods")
+            # Índice por id y por nombre (cacheado por versión de los datos) para el selector
+            indice_alimentos = indice_catalogo("/foods")
+            alimentos = indice_alimentos.elementos
 
             # Container principal con dos columnas
             with st.container():
@@ -51,61 +54,87 @@ def seccion_alimentos():
                             st.session_state.filtro_alimentos = st.text_input(
                                 "🔍 Buscar alimento",
                                 value=st.session_state.filtro_alimentos,
-                                placeholder="Escribe para filtrar..."
+                                placeholder="Nombre o categoría, sin preocuparte por tildes..."
                             )
 
-                            # Filtrar alimentos según el texto de búsqueda
-                            alimentos_filtrados = alimentos
+                            # Filtro por perfil nutricional, resuelto por la API (/foods/search)
+                            with st.expander("🎯 Filtrar por nutrientes", expanded=False):
+                                col_f1, col_f2, col_f3, col_f4 = st.columns(4)
+                                min_proteina = col_f1.number_input("Proteínas mín. (g)", min_value=0.0, value=0.0, step=1.0)
+                                max_kcal = col_f2.number_input("Kcal máx. (0 = sin límite)", min_value=0.0, value=0.0, step=10.0)
+                                categorias = sorted({a['category'] for a in alimentos if a.get('category')})
+                                categoria = col_f3.selectbox("Categoría", ["Todas"] + categorias)
+                                ordenes = {"Nombre": "name", "Más proteína": "-protein_g", "Menos calorías": "kcal", "Menos grasa": "fat_g"}
+                                orden = col_f4.selectbox("Ordenar por", list(ordenes))
+
+                            parametros = {}
                             if st.session_state.filtro_alimentos:
-                                alimentos_filtrados = [a for a in alimentos if st.session_state.filtro_alimentos.lower() in a['name'].lower()]
-
-                            # Dataframe para mostrar alimentos
-                            alimentos_df = pd.DataFrame([{
-                                'Nombre': a['name'],
-                                'Calorías': a['nutrients']['kcal'],
-                                'Proteínas': a['nutrients']['protein_g'],
-                                'Carbohidratos': a['nutrients']['carbs_g'],
-                                'Grasas': a['nutrients']['fat_g'],
-                                'Unidad': a.get('unit', 'N/A'),
-                                'Mercado': a.get('market', 'N/A')
-                            } for a in alimentos_filtrados])
-
-                            # Ajustar altura dinámicamente con un mínimo
-                            altura = max(300, min(100 + len(alimentos_filtrados) * 35, 600))
-                            st.dataframe(
-                                alimentos_df,
-                                use_container_width=True,
-                                height=altura,
-                                hide_index=True,
-                                column_config={
-                                    "Nombre": st.column_config.TextColumn("Nombre", width="medium"),
-                                    "Calorías": st.column_config.NumberColumn("🔥 Calorías", format="%.1f",
-                                                                              width="small"),
-                                    "Proteínas": st.column_config.NumberColumn("🥩 Proteínas (g)", format="%.1f",
-                                                                               width="small"),
-                                    "Carbohidratos": st.column_config.NumberColumn("🍚 Carbos (g)", format="%.1f",
+                                parametros["q"] = st.session_state.filtro_alimentos
+                            if min_proteina > 0:
+                                parametros["min_protein_g"] = min_proteina
+                            if max_kcal > 0:
+                                parametros["max_kcal"] = max_kcal
+                            if categoria != "Todas":
+                                parametros["category"] = categoria
+
+                            alimentos_filtrados = alimentos
+                            if parametros or orden != "Nombre":
+                                # Con texto de búsqueda y sin orden elegido, la API ordena por relevancia
+                                if "q" not in parametros or orden != "Nombre":
+                                    parametros["sort"] = ordenes[orden]
+                                parametros["limit"] = 1000
+                                alimentos_filtrados = fetch_data(f"/foods/search?{urlencode(parametros)}") or []
+
+                            if not alimentos_filtrados:
+                                st.info("🔎 Ningún alimento coincide con la búsqueda o los filtros.")
+                            else:
+                                # Dataframe para mostrar alimentos
+                                alimentos_df = pd.DataFrame([{
+                                    'Nombre': a['name'],
+                                    'Calorías': a['nutrients']['kcal'],
+                                    'Proteínas': a['nutrients']['protein_g'],
+                                    'Carbohidratos': a['nutrients']['carbs_g'],
+                                    'Grasas': a['nutrients']['fat_g'],
+                                    'Unidad': a.get('unit', 'N/A'),
+                                    'Mercado': a.get('market', 'N/A')
+                                } for a in alimentos_filtrados])
+
+                                # Ajustar altura dinámicamente con un mínimo
+                                altura = max(300, min(100 + len(alimentos_filtrados) * 35, 600))
+                                st.dataframe(
+                                    alimentos_df,
+                                    use_container_width=True,
+                                    height=altura,
+                                    hide_index=True,
+                                    column_config={
+                                        "Nombre": st.column_config.TextColumn("Nombre", width="medium"),
+                                        "Calorías": st.column_config.NumberColumn("🔥 Calorías", format="%.1f",
+                                                                                  width="small"),
+                                        "Proteínas": st.column_config.NumberColumn("🥩 Proteínas (g)", format="%.1f",
                                                                                    width="small"),
-                                    "Grasas": st.column_config.NumberColumn("🧈 Grasas (g)", format="%.1f",
-                                                                            width="small"),
-                                    "Unidad": st.column_config.TextColumn("⚖️ Unidad (g)", width="small"),
-                                    "Mercado": st.column_config.TextColumn("🏪 Mercado", width="small"),
-                                }
-                            )
+                                        "Carbohidratos": st.column_config.NumberColumn("🍚 Carbos (g)", format="%.1f",
+                                                                                       width="small"),
+                                        "Grasas": st.column_config.NumberColumn("🧈 Grasas (g)", format="%.1f",
+                                                                                width="small"),
+                                        "Unidad": st.column_config.TextColumn("⚖️ Unidad (g)", width="small"),
+                                        "Mercado": st.column_config.TextColumn("🏪 Mercado", width="small"),
+                                    }
+                                )
 
-                            # Estadísticas resumen
-                            with st.expander("📊 Estadísticas rápidas", expanded=False):
-                                col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
-                                with col_stats1:
-                                    st.metric("Total alimentos", len(alimentos_filtrados))
-                                with col_stats2:
-                                    promedio_calorias = sum(a['nutrients']['kcal'] for a in alimentos_filtrados) / len(alimentos_filtrados)
-                                    st.metric("Promedio calorías", f"{promedio_calorias:.1f}")
-                                with col_stats3:
-                                    max_proteina = max(a['nutrients']['protein_g'] for a in alimentos_filtrados)
-                                    st.metric("Mayor proteína", f"{max_proteina:.1f} g")
-                                with col_stats4:
-                                    mercados = set(a.get('market') for a in alimentos_filtrados if a.get('market'))
-                                    st.metric("Mercados", len(mercados))
+                                # Estadísticas resumen
+                                with st.expander("📊 Estadísticas rápidas", expanded=False):
+                                    col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
+                                    with col_stats1:
+                                        st.metric("Total alimentos", len(alimentos_filtrados))
+                                    with col_stats2:
+                                        promedio_calorias = sum(a['nutrients']['kcal'] for a in alimentos_filtrados) / len(alimentos_filtrados)
+                                        st.metric("Promedio calorías", f"{promedio_calorias:.1f}")
+                                    with col_stats3:
+                                        max_proteina = max(a['nutrients']['protein_g'] for a in alimentos_filtrados)
+                                        st.metric("Mayor proteína", f"{max_proteina:.1f} g")
+                                    with col_stats4:
+                                        mercados = set(a.get('market') for a in alimentos_filtrados if a.get('market'))
+                                        st.metric("Mercados", len(mercados))
                         else:
                             st.info("📝 No hay alimentos registrados. ¡Comienza agregando uno nuevo!")
 
@@ -135,14 +164,14 @@ def seccion_alimentos():
                             alimento_id = st.selectbox(
                                 "Alimento",
                                 options=[id for id, _ in opciones_alimentos],
-                                format_func=lambda x: next((name for id, name in opciones_alimentos if id == x), ""),
+                                format_func=lambda x: indice_alimentos.por_id[x]["name"],
                                 key="selector_alimentos",
                                 label_visibility="collapsed"
                             )
 
                             # Obtener el alimento seleccionado completo
                             if alimento_id:
-                                alimento_seleccionado = next((a for a in alimentos if a["id"] == alimento_id), None)
+                                alimento_seleccionado = indice_alimentos.por_id.get(alimento_id)
                                 st.session_state.alimento_seleccionado = alimento_seleccionado
 
                                 # Mostrar información nutricional del alimento seleccionado
@@ -4,7 +4,10 @@ import pandas as pd
 from datetime import date, timedelta
 import plotly.express as px
 from typing import List, Optional
-from frontend_utils import fetch_data, post_data, update_data, delete_data, clear_caches
+from frontend_utils import (
+    fetch_data, fetch_many, fetch_by_ids, post_data, update_data, delete_data, clear_caches, autocompletar_alimentos,
+    indice_catalogo, IndiceCatalogo,
+)
 
 
 def seccion_planificador():
@@ -24,31 +27,38 @@ def seccion_planificador():
     if 'editar_comida_planificador' not in st.session_state:
         st.session_state.editar_comida_planificador = None
 
-    # Cargar datos desde la API
-    comidas = fetch_data("/meals") or []
-    recetas = fetch_data("/recipes") or []
-    alimentos = fetch_data("/foods") or []
-
-    # Diccionarios para búsquedas rápidas
-    food_dict = {a['id']: a['name'] for a in alimentos}
-    recipe_dict = {r['id']: r['name'] for r in recetas}
-
-    def get_food_name(food_id):
-        return food_dict.get(food_id, f"Alimento #{food_id}")
+    # Cargar datos desde la API (solo las comidas de la semana visible)
+    fecha_actual = st.session_state.fecha_planificador
+    lunes = fecha_actual - timedelta(days=fecha_actual.weekday())
+    domingo = lunes + timedelta(days=6)
+    # Con expand=components cada componente trae su nombre y sus nutrientes: para mostrar la semana
+    # no hace falta descargar los catálogos de recetas y alimentos
+    comidas = fetch_data(f"/meals?from={lunes.isoformat()}&to={domingo.isoformat()}&expand=components") or []
 
-    def get_recipe_name(recipe_id):
-        return recipe_dict.get(recipe_id, f"Receta #{recipe_id}")
+    def get_component_name(item):
+        # name es None si el alimento o la receta se ha borrado
+        tipo = "Receta" if item['component_type'] == 'recipe' else "Alimento"
+        return item.get('name') or f"{tipo} #{item['component_id']}"
 
     # Crear un conjunto con fechas que tienen comidas
     fechas_con_comidas = {c.get('meal_date') for c in comidas if c.get('meal_date')}
 
     # Si estamos en modo formulario, mostrar el formulario y salir
     if st.session_state.mostrar_form_comida_planificador:
+        # Los selectores del formulario sí necesitan los catálogos (solo los campos que usa, pedidos a la vez)
+        fetch_many(["/recipes?fields=id,name,nutrients", "/foods?fields=id,name,category,unit,nutrients"])
+        # Índices por id y por nombre (cacheados por versión de los datos) para las búsquedas del formulario
+        recetas = indice_catalogo("/recipes?fields=id,name,nutrients")
+        alimentos = indice_catalogo("/foods?fields=id,name,category,unit,nutrients")
+
         # Determinar si estamos en modo edición
         comida_existente = None
         if st.session_state.editar_comida_planificador:
             comida_existente = next((c for c in comidas if c['id'] == st.session_state.editar_comida_planificador),
                                     None)
+            if comida_existente is None:
+                # La comida puede pertenecer a otra semana (editada desde el formulario)
+                comida_existente = fetch_data(f"/meals/{st.session_state.editar_comida_planificador}")
 
         # Pasar la fecha actual seleccionada al formulario
         fecha_actual = st.session_state.fecha_planificador
@@ -81,9 +91,6 @@ def seccion_planificador():
         return
 
     # ===================== PANEL PRINCIPAL DE NAVEGACIÓN =====================
-    fecha_actual = st.session_state.fecha_planificador
-    lunes = fecha_actual - timedelta(days=fecha_actual.weekday())
-
     # Contenedor mejorado con borde para la navegación del calendario
     with st.container(border=True):
         st.markdown("""
@@ -193,6 +200,12 @@ def seccion_planificador():
                 "fat_g": 0
             }
 
+            # Recetas completas (con ingredientes) de todas las comidas del día en una sola petición
+            recetas_completas = fetch_by_ids("recipes", (
+                item['component_id'] for comida in comidas_fecha for item in comida['items']
+                if item['component_type'] == 'recipe'
+            ))
+
             # Mostrar cada comida en una tarjeta mejorada
             for comida in comidas_fecha:
                 # Expander mejorado con información visual en el título
@@ -219,8 +232,8 @@ def seccion_planificador():
                             recetas_items = [item for item in comida["items"] if item["component_type"] == "recipe"]
                             for item in recetas_items:
                                 receta_id = item['component_id']
-                                receta_nombre = get_recipe_name(receta_id)
-                                receta_completa = fetch_data(f"/recipes/{receta_id}")
+                                receta_nombre = get_component_name(item)
+                                receta_completa = recetas_completas.get(receta_id)
 
                                 if receta_completa:
                                     # Crear texto resumido de ingredientes
@@ -255,22 +268,20 @@ def seccion_planificador():
                             # Procesar alimentos adicionales
                             alimentos_items = [item for item in comida["items"] if item["component_type"] == "food"]
                             for item in alimentos_items:
-                                alimento_nombre = get_food_name(item['component_id'])
+                                alimento_nombre = get_component_name(item)
                                 cantidad = item['quantity']
-                                alimento_completo = next((a for a in alimentos if a['id'] == item['component_id']),
-                                                         None)
 
-                                if alimento_completo and "nutrients" in alimento_completo:
-                                    factor = cantidad / 100
+                                # Nutrientes ya calculados por la API para la cantidad de la comida
+                                if item.get('nutrients'):
                                     componentes_data.append({
                                         "Tipo": "🥗 Alimento",
                                         "Nombre": alimento_nombre,
                                         "Detalles": "-",
                                         "Cantidad": f"{cantidad} g",
-                                        "Kcal": f"{alimento_completo['nutrients']['kcal'] * factor:.0f}",
-                                        "Prot": f"{alimento_completo['nutrients']['protein_g'] * factor:.1f} g",
-                                        "Carbos": f"{alimento_completo['nutrients']['carbs_g'] * factor:.1f} g",
-                                        "Grasas": f"{alimento_completo['nutrients']['fat_g'] * factor:.1f} g"
+                                        "Kcal": f"{item['nutrients']['kcal']:.0f}",
+                                        "Prot": f"{item['nutrients']['protein_g']:.1f} g",
+                                        "Carbos": f"{item['nutrients']['carbs_g']:.1f} g",
+                                        "Grasas": f"{item['nutrients']['fat_g']:.1f} g"
                                     })
 
                             # Mostrar tabla unificada con mejor estilo
@@ -394,6 +405,10 @@ def seccion_planificador():
         </h3>
         """, unsafe_allow_html=True)
 
+        # Totales por día calculados en la API (una fila por día con comidas)
+        totales_semana = fetch_data(f"/stats/daily?from={lunes.isoformat()}&to={domingo.isoformat()}") or []
+        totales_por_dia = {t['meal_date']: t for t in totales_semana}
+
         # Mostrar tarjeta para cada día de la semana
         for i in range(7):
             dia = lunes + timedelta(days=i)
@@ -450,19 +465,15 @@ def seccion_planificador():
                         st.rerun()
 
                 # Contenido del día mejorado
-                if comidas_dia:
-                    # Calcular totales
-                    total_dia = {"kcal": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0}
-
-                    for comida in comidas_dia:
-                        for key in total_dia:
-                            total_dia[key] += comida["nutrients"][key]
+                resumen_dia = totales_por_dia.get(dia_iso)
+                if resumen_dia:
+                    total_dia = resumen_dia["nutrients"]
 
                     # Mostrar resumen de comidas con mejor formato
                     st.markdown(f"""
                     <div style='margin-top:8px; display:flex; align-items:center; gap:15px;'>
                         <span style='font-weight:500;'>
-                            <span style='color:#64B5F6;'>{len(comidas_dia)}</span> comidas
+                            <span style='color:#64B5F6;'>{resumen_dia['meals']}</span> comidas
                         </span>
                         <span>•</span>
                         <span style='font-weight:500;'>
@@ -480,7 +491,7 @@ def seccion_planificador():
                     for comida in comidas_dia:
                         for item in comida.get("items", []):
                             if item["component_type"] == "recipe":
-                                todas_recetas.append(get_recipe_name(item["component_id"]))
+                                todas_recetas.append(get_component_name(item))
 
                     if todas_recetas:
                         st.markdown(f"""
@@ -499,7 +510,7 @@ def seccion_planificador():
                     """, unsafe_allow_html=True)
 
 
-def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[dict],
+def formulario_comida(fecha_seleccionada, recetas: IndiceCatalogo, alimentos: IndiceCatalogo,
                   comida_existente: Optional[dict] = None) -> Optional[dict]:
     """
     Formulario para crear o editar una comida.
@@ -507,8 +518,8 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
 
     Args:
         fecha_seleccionada: Fecha seleccionada en el planificador
-        recetas: Lista de recetas disponibles
-        alimentos: Lista de alimentos disponibles
+        recetas: Índice de las recetas disponibles (indice_catalogo)
+        alimentos: Índice de los alimentos disponibles (indice_catalogo)
         comida_existente: Datos de comida existente si estamos editando
 
     Returns:
@@ -537,7 +548,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
             st.session_state.comida_recetas_temp = []
             for item in comida_existente.get('items', []):
                 if item['component_type'] == 'recipe':
-                    receta = next((r for r in recetas if r['id'] == item['component_id']), None)
+                    receta = recetas.por_id.get(item['component_id'])
                     if receta:
                         st.session_state.comida_recetas_temp.append(receta['name'])
         else:
@@ -549,7 +560,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
             st.session_state.comida_alimentos_temp = []
             for item in comida_existente.get('items', []):
                 if item['component_type'] == 'food':
-                    alimento = next((a for a in alimentos if a['id'] == item['component_id']), None)
+                    alimento = alimentos.por_id.get(item['component_id'])
                     if alimento:
                         st.session_state.comida_alimentos_temp.append({
                             "nombre": alimento['name'],
@@ -581,9 +592,9 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
             try:
                 # Obtener comidas para esta fecha
                 comidas_del_dia = []
-                comidas_response = fetch_data("/meals")
+                comidas_response = fetch_data(f"/meals?from={fecha_comida.isoformat()}&to={fecha_comida.isoformat()}")
                 if comidas_response:
-                    comidas_del_dia = [c for c in comidas_response if c.get('meal_date') == fecha_comida.isoformat()]
+                    comidas_del_dia = comidas_response
 
                     # Filtrar la comida que estamos editando
                     if comida_existente:
@@ -610,11 +621,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
                                         for item in recetas_items:
                                             # Buscar directamente el nombre de la receta
                                             recipe_id = item['component_id']
-                                            recipe_name = f"Receta #{recipe_id}"  # Valor predeterminado
-                                            for r in recetas:
-                                                if r['id'] == recipe_id:
-                                                    recipe_name = r['name']
-                                                    break
+                                            recipe_name = recetas.por_id.get(recipe_id, {}).get('name', f"Receta #{recipe_id}")
                                             recetas_nombres.append(f"🍽️ {recipe_name}")
                                         st.write(", ".join(recetas_nombres))
 
@@ -626,11 +633,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
                                         for item in alimentos_items:
                                             # Buscar directamente el nombre del alimento
                                             food_id = item['component_id']
-                                            food_name = f"Alimento #{food_id}"  # Valor predeterminado
-                                            for a in alimentos:
-                                                if a['id'] == food_id:
-                                                    food_name = a['name']
-                                                    break
+                                            food_name = alimentos.por_id.get(food_id, {}).get('name', f"Alimento #{food_id}")
                                             alimentos_nombres.append(f"🥗 {food_name} ({item['quantity']}g)")
                                         st.write(", ".join(alimentos_nombres))
 
@@ -663,9 +666,9 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
         try:
             # Intentar obtener las comidas para esta fecha
             comidas_del_dia = []
-            comidas_response = fetch_data("/meals")
+            comidas_response = fetch_data(f"/meals?from={fecha_comida.isoformat()}&to={fecha_comida.isoformat()}")
             if comidas_response:
-                comidas_del_dia = [c for c in comidas_response if c.get('meal_date') == fecha_comida.isoformat()]
+                comidas_del_dia = comidas_response
 
                 # Filtrar la comida que estamos editando si es necesario
                 if comida_existente:
@@ -701,7 +704,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
         with col_recetas:
             st.markdown("<label style='font-weight:500; color:#64B5F6;'>🍽️ Seleccionar receta</label>", unsafe_allow_html=True)
             # Lista de nombres de recetas para seleccionar
-            nombres_recetas = [r['name'] for r in recetas if r['name'] not in st.session_state.comida_recetas_temp]
+            nombres_recetas = [r['name'] for r in recetas.elementos if r['name'] not in st.session_state.comida_recetas_temp]
             receta_seleccionada = st.selectbox(
                 "Seleccionar receta",
                 options=[""] + nombres_recetas,
@@ -712,8 +715,14 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
         # SELECTOR DE ALIMENTOS - Columna derecha con etiqueta mejorada
         with col_alimentos:
             st.markdown("<label style='font-weight:500; color:#64B5F6;'>🥗 Seleccionar alimento</label>", unsafe_allow_html=True)
-            # Filtrar alimentos ya añadidos
-            alimentos_disponibles = [a['name'] for a in alimentos]
+            # Sugerencias incrementales de la API en lugar de la lista completa de alimentos
+            prefijo = st.text_input(
+                "Buscar alimento",
+                placeholder="Escribe el inicio del nombre...",
+                key="alim_buscar",
+                label_visibility="collapsed"
+            )
+            alimentos_disponibles = autocompletar_alimentos(prefijo)
             nombre_alim_seleccionado = st.selectbox(
                 "Seleccionar alimento",
                 options=[""] + alimentos_disponibles,
@@ -722,7 +731,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
             )
 
             # Obtener el objeto completo del alimento
-            alim_completo = next((a for a in alimentos if a['name'] == nombre_alim_seleccionado), None)
+            alim_completo = alimentos.por_nombre.get(nombre_alim_seleccionado)
 
             # Determinar el step según el valor de unit del alimento
             step_valor = 10.0  # Valor predeterminado (convertido a float)
@@ -834,7 +843,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
 
             # Añadir recetas a la tabla unificada
             for idx, nombre_receta in enumerate(st.session_state.comida_recetas_temp):
-                receta_info = next((r for r in recetas if r['name'] == nombre_receta), None)
+                receta_info = recetas.por_nombre.get(nombre_receta)
                 if receta_info:
                     elementos_data.append({
                         "Tipo": "🍽️ Receta",
@@ -849,7 +858,7 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
 
             # Añadir alimentos a la tabla unificada
             for idx, alim in enumerate(st.session_state.comida_alimentos_temp):
-                alim_info = next((a for a in alimentos if a['name'] == alim["nombre"]), None)
+                alim_info = alimentos.por_nombre.get(alim["nombre"])
                 if alim_info:
                     factor = alim["cantidad"] / 100
                     elementos_data.append({
@@ -931,14 +940,14 @@ def formulario_comida(fecha_seleccionada, recetas: List[dict], alimentos: List[d
         if st.session_state.comida_recetas_temp or st.session_state.comida_alimentos_temp:
             # Sumar nutrientes de recetas
             for nombre_receta in st.session_state.comida_recetas_temp:
-                receta_info = next((r for r in recetas if r['name'] == nombre_receta), None)
+                receta_info = recetas.por_nombre.get(nombre_receta)
                 if receta_info and 'nutrients' in receta_info:
                     for key in total_nutrients:
                         total_nutrients[key] += receta_info['nutrients'].get(key, 0)
 
             # Sumar nutrientes de alimentos
             for alim in st.session_state.comida_alimentos_temp:
-                alim_info = next((a for a in alimentos if a['name'] == alim["nombre"]), None)
+                alim_info = alimentos.por_nombre.get(alim["nombre"])
                 if alim_info and 'nutrients' in alim_info:
                     factor = alim["cantidad"] / 100
                     for key in total_nutrients:
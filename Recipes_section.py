@@ -4,7 +4,7 @@ import pandas as pd
 from datetime import date, timedelta
 import plotly.express as px
 from typing import List, Optional
-from frontend_utils import fetch_data, post_data, update_data, delete_data, clear_caches
+from frontend_utils import fetch_many, post_data, update_data, delete_data, clear_caches, autocompletar_alimentos, indice_catalogo
 
 
 # Sección: Recetas
@@ -25,8 +25,11 @@ def seccion_recetas():
         st.session_state.mostrar_form_receta = False
 
     # Obtener recetas y alimentos de la API
-    recetas = fetch_data("/recipes")
-    alimentos = fetch_data("/foods")
+    fetch_many(["/recipes", "/foods?fields=id,name,category,unit,nutrients"])
+    # Índices por id y por nombre, cacheados por versión de los datos
+    indice_recetas = indice_catalogo("/recipes")
+    recetas = indice_recetas.elementos
+    alimentos = indice_catalogo("/foods?fields=id,name,category,unit,nutrients")
 
     # Control de mostrar/ocultar formulario
     if st.session_state.mostrar_form_receta:
@@ -34,10 +37,7 @@ def seccion_recetas():
         receta_editar = None
         if st.session_state.editar_receta:
             # Buscar la receta a editar
-            for r in recetas:
-                if r['id'] == st.session_state.editar_receta:
-                    receta_editar = r
-                    break
+            receta_editar = indice_recetas.por_id.get(st.session_state.editar_receta)
 
             if not receta_editar:
                 st.error("No se encontró la receta seleccionada.")
@@ -271,7 +271,7 @@ def formulario_receta(alimentos, receta_editar=None):
     Muestra un formulario para crear o editar una receta.
 
     Args:
-        alimentos: Lista de alimentos disponibles
+        alimentos: Índice de los alimentos disponibles (indice_catalogo)
         receta_editar: Receta existente para editar (None para nueva receta)
 
     Returns:
@@ -326,18 +326,20 @@ def formulario_receta(alimentos, receta_editar=None):
 
     # Columna derecha: Selector de ingredientes
     with col_der:
-        with st.container(border=True, height=245):
+        with st.container(border=True, height=300):
             st.markdown("##### 🥕 Añadir ingredientes")
-            if alimentos:
+            if alimentos.elementos:
                 # Diseño con tres columnas en lugar de dos
                 col1, col2, col3 = st.columns([3, 1.8, 0.8])
 
                 with col1:
-                    opciones_alimentos = [food["name"] for food in alimentos]
-                    alimento_sel = st.selectbox("Selecciona un alimento", opciones_alimentos)
+                    # Sugerencias incrementales de la API en lugar de la lista completa de alimentos
+                    prefijo = st.text_input("Buscar alimento", placeholder="Escribe el inicio del nombre...", key="buscar_ingrediente")
+                    opciones_alimentos = autocompletar_alimentos(prefijo)
+                    alimento_sel = st.selectbox("Selecciona un alimento", opciones_alimentos, label_visibility="collapsed")
 
                     # Obtener el alimento seleccionado completo
-                    alimento_completo = next((food for food in alimentos if food["name"] == alimento_sel), None)
+                    alimento_completo = alimentos.por_nombre.get(alimento_sel)
 
                     # Determinar el step según el valor de unit del alimento
                     step_valor = 5.0  # Valor predeterminado (convertido a float)
@@ -353,7 +355,7 @@ def formulario_receta(alimentos, receta_editar=None):
                     st.session_state.cantidad_actual = float(step_valor) if step_valor > 1 else 100.0
 
                 with col2:
-                    cat = alimento_completo["category"]
+                    cat = alimento_completo["category"] if alimento_completo else None
                     if cat == 'Aceites y grasas':
                         txt = "Cucharada/s"
                     elif cat == 'Bebidas':
@@ -441,7 +443,7 @@ def formulario_receta(alimentos, receta_editar=None):
             cantidad = ing["cantidad"]
 
             # Buscar el alimento en la lista
-            alimento_data = next((a for a in alimentos if a["name"] == alimento_nombre), None)
+            alimento_data = alimentos.por_nombre.get(alimento_nombre)
 
             # Calcular nutrientes
             nutrientes = {"kcal": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0}
@@ -1,17 +1,22 @@
+import hashlib
+import json
 import logging
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Literal, Tuple
 from datetime import date
-from fastapi import FastAPI, HTTPException, Path, Body
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Path, Body, Query, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
+import db_config
 from db_config import (
     Food, Recipe, Meal,
-    create_food, get_foods, get_food_by_id, update_food, delete_food,
-    create_recipe, get_recipes, get_recipe_by_id, update_recipe, delete_recipe,
-    create_meal, get_meals, get_meal_by_id, update_meal, delete_meal,
-    get_recipe_with_ingredients, get_recipes_with_ingredients,
-    get_meals_with_items, get_meal_with_items, get_meals_by_date,
+    bulk_create_foods, autocomplete_foods, get_meals_by_date,
+    get_daily_nutrient_totals, get_weekly_nutrient_totals,
+    food_catalog, load_food_catalog, upgrade_db, get_job, EXPORTERS,
 )
+import jobs
 
 # uvicorn api:app --reload
 
@@ -23,7 +28,20 @@ logging.basicConfig(
 logger = logging.getLogger("db_logger")
 
 # ---------------------- FastAPI App ----------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Aplica tablas e índices nuevos sobre la base de datos existente
+    upgrade_db()
+    # Catálogo en memoria listo antes de la primera petición (autocompletado y resolución de ingredientes)
+    load_food_catalog()
+    # Trabajos que dejó a medias un proceso anterior: fallidos; y latidos para los de este
+    jobs.start()
+    yield
+    jobs.shutdown()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="API de Nutrición y Alimentos",
     description="""
     Esta API permite gestionar un sistema completo de seguimiento nutricional:
@@ -48,8 +66,22 @@ app = FastAPI(
             "name": "comidas",
             "description": "Registro y consulta de comidas diarias",
         },
+        {
+            "name": "estadisticas",
+            "description": "Totales nutricionales agregados por día y por semana",
+        },
+        {
+            "name": "exportacion",
+            "description": "Volcado completo de los datos en formato NDJSON",
+        },
+        {
+            "name": "trabajos",
+            "description": "Operaciones largas ejecutadas en segundo plano",
+        },
     ]
 )
+# Los listados completos (/foods, /recipes, /export) se comprimen si el cliente acepta gzip
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 
 @app.get("/",
@@ -75,15 +107,160 @@ def api_welcome():
 
 
 
+# ---------------------- Capa de datos ----------------------
+# Los endpoints CRUD de alimentos, recetas y comidas son async def y piden sus datos a la capa de
+# la aplicación que los sirve (app.state.data): aquí db_config en el threadpool y en api_async.py
+# async_db_config. Así el cuerpo de cada endpoint es el mismo en los dos modos.
+DataLayer = Any
+
+
+class ThreadpoolDataLayer:
+    """Funciones de db_config con la interfaz de async_db_config: cada llamada se ejecuta en el threadpool."""
+
+    def __getattr__(self, name: str):
+        operation = getattr(db_config, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(operation, *args, **kwargs)
+        return call
+
+
+app.state.data = ThreadpoolDataLayer()
+
+
+def data_layer(request: Request) -> DataLayer:
+    return request.app.state.data
+
+
+# ---------------------- Helpers ----------------------
+
+def _food_to_dict(db_food) -> Dict:
+    # Respuesta de un alimento: solo sus campos, sin las columnas de nutrientes sueltas del modelo
+    return {
+        "id": db_food.id,
+        "name": db_food.name,
+        "category": db_food.category,
+        "unit": db_food.unit,
+        "market": db_food.market,
+        "nutrients": db_food.nutrients,
+    }
+
+
+def validar_rango_fechas(date_from: Optional[date], date_to: Optional[date]):
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="La fecha 'from' debe ser anterior o igual a 'to'")
+
+
+# Tablas de las que depende cada listado: sus versiones forman el ETag
+LIST_TABLES = {
+    "foods": ("foods",),
+    "recipes": ("recipes", "recipe_items", "foods"),
+    "meals": ("meals", "meal_items"),
+    # Con expand=components también cambian al editar los alimentos y recetas que contienen
+    "meals_expanded": ("meals", "meal_items", "foods", "recipes"),
+}
+
+
+def list_etag(request: Request, resource: str, versions: Tuple) -> str:
+    # ETag débil: el cuerpo puede ir comprimido con gzip o sin comprimir (GZipMiddleware) y
+    # ambas versiones son equivalentes para revalidar
+    key = f"{resource}:{versions}:{request.url.query}"
+    return 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def not_modified(request: Request, response: Response, resource: str, versions: Tuple) -> Optional[Response]:
+    """
+    Añade el ETag del listado a la respuesta y devuelve un 304 si coincide con If-None-Match.
+
+    versions son las de las tablas de LIST_TABLES[resource] (get_table_versions), que viven en
+    la base de datos: una escritura desde otro worker o proceso también cambia el ETag. Se leen
+    antes que los datos: si hay una escritura entre medias, el ETag enviado es el anterior y
+    la siguiente petición condicional recibe el cuerpo completo.
+    """
+    etag = list_etag(request, resource, versions)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Comparación débil: se ignora el prefijo W/
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag.removeprefix("W/") in candidates or "*" in candidates:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def pagination_params(
+    after_id: Optional[int] = Query(None, ge=0, description="Devuelve elementos con id mayor que este cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Número máximo de elementos"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. id,name")
+) -> Dict:
+    return {"after_id": after_id, "limit": limit, "fields": fields}
+
+
+def ids_param(
+    ids: Optional[str] = Query(None, description="Ids separados por comas, p. ej. 1,2,3: devuelve solo esos elementos (máximo 1000)")
+) -> Optional[List[int]]:
+    # "3,1,3" -> [3, 1]; sin ids se devuelve el listado paginado
+    if ids is None:
+        return None
+    try:
+        parsed = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids debe ser una lista de enteros separados por comas")
+    if not parsed or len(parsed) > 1000:
+        raise HTTPException(status_code=400, detail="ids debe contener entre 1 y 1000 ids")
+    return parsed
+
+
+def by_ids_page(page: Dict) -> Optional[str]:
+    # Con ids no hay paginación: solo se admite fields (ValueError -> 400 en el endpoint)
+    if page["after_id"] is not None or page["limit"] is not None:
+        raise ValueError("ids no se puede combinar con after_id ni limit")
+    return page["fields"]
+
+
+def expand_param(
+    expand: Optional[Literal["components"]] = Query(None, description="components: añade a cada componente su nombre y sus nutrientes para la cantidad de la comida")
+) -> bool:
+    return expand == "components"
+
+
+def nutrient_range_params(
+    min_kcal: Optional[float] = Query(None, ge=0, description="Kcal mínimas por 100 g"),
+    max_kcal: Optional[float] = Query(None, ge=0, description="Kcal máximas por 100 g"),
+    min_protein_g: Optional[float] = Query(None, ge=0, description="Proteínas mínimas (g/100 g)"),
+    max_protein_g: Optional[float] = Query(None, ge=0, description="Proteínas máximas (g/100 g)"),
+    min_fat_g: Optional[float] = Query(None, ge=0, description="Grasas mínimas (g/100 g)"),
+    max_fat_g: Optional[float] = Query(None, ge=0, description="Grasas máximas (g/100 g)"),
+    min_carbs_g: Optional[float] = Query(None, ge=0, description="Carbohidratos mínimos (g/100 g)"),
+    max_carbs_g: Optional[float] = Query(None, ge=0, description="Carbohidratos máximos (g/100 g)"),
+    min_fiber_g: Optional[float] = Query(None, ge=0, description="Fibra mínima (g/100 g)"),
+    max_fiber_g: Optional[float] = Query(None, ge=0, description="Fibra máxima (g/100 g)"),
+    min_cholesterol_mg: Optional[float] = Query(None, ge=0, description="Colesterol mínimo (mg/100 g)"),
+    max_cholesterol_mg: Optional[float] = Query(None, ge=0, description="Colesterol máximo (mg/100 g)")
+) -> Dict:
+    # {"protein_g": (min, max), ...} solo con los nutrientes filtrados
+    ranges = {
+        "kcal": (min_kcal, max_kcal),
+        "protein_g": (min_protein_g, max_protein_g),
+        "fat_g": (min_fat_g, max_fat_g),
+        "carbs_g": (min_carbs_g, max_carbs_g),
+        "fiber_g": (min_fiber_g, max_fiber_g),
+        "cholesterol_mg": (min_cholesterol_mg, max_cholesterol_mg),
+    }
+    return {key: bounds for key, bounds in ranges.items() if bounds != (None, None)}
+
 # ---------------------- Food Endpoints ----------------------
 
 @app.post("/foods",
     response_model=Food,
+    # Fibra y colesterol sin valor no se devuelven como null (igual que en GET /foods/{id})
+    response_model_exclude_unset=True,
     tags=["alimentos"],
     summary="Crear nuevo alimento",
     description="Crea un alimento con su información nutricional completa."
 )
-def api_create_food(food: Food = Body(..., description="Datos del alimento a crear")):
+async def api_create_food(food: Food = Body(..., description="Datos del alimento a crear"), data: DataLayer = Depends(data_layer)):
     """
     Crea un nuevo alimento con la siguiente información:
 
@@ -94,42 +271,134 @@ def api_create_food(food: Food = Body(..., description="Datos del alimento a cre
     - **market**: Mercado donde se encuentra (opcional)
     """
     try:
-        return create_food(food)
+        return _food_to_dict(await data.create_food(food))
     except Exception as e:
         logger.exception("Error al crear alimento")
         raise HTTPException(status_code=500, detail=f"Error al crear alimento: {str(e)}")
 
+@app.post("/foods/bulk",
+    tags=["alimentos"],
+    summary="Importar alimentos en bloque",
+    description="Crea muchos alimentos en una sola transacción e informa de los errores fila a fila."
+)
+def api_bulk_create_foods(foods: List[Dict] = Body(..., description="Lista de alimentos a crear")):
+    """
+    Importa una lista de alimentos con el mismo formato que **POST /foods**.
+
+    Todas las filas se validan antes de insertar. Las válidas se guardan en una única
+    transacción y la respuesta incluye:
+
+    - **created**: Número de alimentos creados
+    - **errors**: Filas rechazadas con su índice, nombre y motivo
+    """
+    try:
+        return bulk_create_foods(foods)
+    except Exception as e:
+        logger.exception("Error al importar alimentos")
+        raise HTTPException(status_code=500, detail="Error al importar alimentos")
+
 @app.get("/foods",
     tags=["alimentos"],
-    summary="Listar todos los alimentos",
-    description="Obtiene un listado de todos los alimentos registrados."
+    summary="Listar alimentos",
+    description="Obtiene un listado de los alimentos registrados, con paginación por cursor y selección de campos."
 )
-def api_get_foods():
+async def api_get_foods(request: Request, response: Response, page: Dict = Depends(pagination_params),
+                        ids: Optional[List[int]] = Depends(ids_param), data: DataLayer = Depends(data_layer)):
     """
-    Devuelve todos los alimentos con su información nutricional completa.
+    Devuelve los alimentos con su información nutricional completa.
+
+    - **after_id**: Cursor; se devuelven los alimentos con id mayor (usar el id del último recibido)
+    - **limit**: Tamaño de página
+    - **fields**: Campos a devolver, p. ej. `id,name` para selectores
+    - **ids**: Solo estos alimentos, en el orden pedido y con una única consulta (los que no existen se omiten)
+
+    Responde con `ETag`; con `If-None-Match` y sin cambios en los alimentos devuelve 304 sin cuerpo.
     """
+    cached = not_modified(request, response, "foods", await data.get_table_versions(*LIST_TABLES["foods"]))
+    if cached:
+        return cached
     try:
-        return get_foods()
+        if ids is not None:
+            return list((await data.get_foods_by_ids(ids, by_ids_page(page))).values())
+        return await data.get_foods_page(**page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("Error al recuperar alimentos")
         raise HTTPException(status_code=500, detail="Error al recuperar alimentos")
 
+@app.get("/foods/search",
+    tags=["alimentos"],
+    summary="Buscar alimentos por texto y nutrientes",
+    description="Busca alimentos por texto con un índice FTS5 y los filtra y ordena por rangos de nutrientes y categoría en la base de datos."
+)
+async def api_search_foods(
+    q: Optional[str] = Query(None, min_length=1, description="Texto a buscar en nombre y categoría (sin tildes, por prefijo y tolerante a erratas)"),
+    ranges: Dict = Depends(nutrient_range_params),
+    category: Optional[str] = Query(None, description="Categoría exacta del alimento"),
+    sort: Optional[str] = Query(None, description="Campo de orden: name o un nutriente, con '-' para descendente (p. ej. -protein_g)"),
+    limit: int = Query(50, ge=1, le=1000, description="Número máximo de alimentos"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. id,name"),
+    data: DataLayer = Depends(data_layer)
+):
+    """
+    Busca alimentos por texto y perfil nutricional sin descargar el catálogo completo.
+
+    - **q**: Texto libre, p. ej. `platano`, `pan trig` o `calamr`; sin `sort` se ordena por relevancia
+    - **min_<nutriente>** / **max_<nutriente>**: Rango por 100 g (kcal, protein_g, fat_g, carbs_g, fiber_g, cholesterol_mg)
+    - **category**: Categoría exacta
+    - **sort**: Orden, p. ej. `-protein_g` para los más proteicos primero
+    - **limit**: Número máximo de resultados
+
+    Ejemplos: `/foods/search?min_protein_g=20&max_kcal=150&sort=-protein_g`, `/foods/search?q=pollo`
+    """
+    try:
+        return await data.search_foods(ranges, category, sort, limit, fields, q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error al buscar alimentos")
+        raise HTTPException(status_code=500, detail="Error al buscar alimentos")
+
+@app.get("/foods/autocomplete",
+    tags=["alimentos"],
+    summary="Autocompletar nombres de alimentos",
+    description="Sugerencias de alimentos por prefijo servidas desde la caché en memoria; solo consulta la versión del catálogo. Un prefijo en blanco devuelve 400."
+)
+def api_autocomplete_foods(
+    prefix: str = Query(..., min_length=1, description="Inicio del nombre o de una de sus palabras (sin importar tildes)"),
+    limit: int = Query(10, ge=1, le=100, description="Número máximo de sugerencias")
+):
+    """
+    Devuelve `id` y `name` de los alimentos que empiezan por el prefijo, para búsquedas incrementales.
+
+    Ejemplo: `/foods/autocomplete?prefix=plat` sugiere "Plátano", y `prefix=trig` sugiere "Pan de trigo, blanco".
+    """
+    try:
+        return autocomplete_foods(prefix, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error al autocompletar alimentos")
+        raise HTTPException(status_code=500, detail="Error al autocompletar alimentos")
+
 @app.get("/foods/{food_id}",
     tags=["alimentos"],
     summary="Obtener alimento por ID",
     description="Busca y devuelve la información de un alimento específico."
 )
-def api_get_food_by_id(
-    food_id: int = Path(..., title="ID del alimento", description="ID único del alimento", ge=1)
+async def api_get_food_by_id(
+    food_id: int = Path(..., title="ID del alimento", description="ID único del alimento", ge=1),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Recupera la información completa de un alimento según su ID.
     """
     try:
-        food = get_food_by_id(food_id)
+        food = await data.get_food_by_id(food_id)
         if not food:
             raise HTTPException(status_code=404, detail=f"Alimento con ID {food_id} no encontrado")
-        return food
+        return _food_to_dict(food)
     except HTTPException:
         raise
     except Exception as e:
@@ -141,15 +410,20 @@ def api_get_food_by_id(
     summary="Actualizar alimento",
     description="Modifica los datos de un alimento existente."
 )
-def api_update_food(
+async def api_update_food(
     food_id: int = Path(..., title="ID del alimento", description="ID único del alimento", ge=1),
-    food: Food = Body(..., description="Nuevos datos del alimento")
+    food: Food = Body(..., description="Nuevos datos del alimento"),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Actualiza la información de un alimento existente, incluyendo sus valores nutricionales.
+
+    Si cambian los nutrientes, las recetas y comidas que lo usan se recalculan en la misma
+    transacción; `recomputed` indica cuántas recetas, comidas y días se han actualizado.
     """
     try:
-        return update_food(food_id, food)
+        db_food = await data.update_food(food_id, food)
+        return {**_food_to_dict(db_food), "recomputed": db_food.recomputed}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -161,14 +435,15 @@ def api_update_food(
     summary="Eliminar alimento",
     description="Elimina permanentemente un alimento de la base de datos."
 )
-def api_delete_food(
-    food_id: int = Path(..., title="ID del alimento", description="ID único del alimento", ge=1)
+async def api_delete_food(
+    food_id: int = Path(..., title="ID del alimento", description="ID único del alimento", ge=1),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Elimina un alimento según su ID. Esta operación no se puede deshacer.
     """
     try:
-        if delete_food(food_id):
+        if await data.delete_food(food_id):
             return {"mensaje": f"Alimento con ID {food_id} eliminado correctamente"}
         raise HTTPException(status_code=404, detail=f"Alimento con ID {food_id} no encontrado")
     except HTTPException:
@@ -184,7 +459,7 @@ def api_delete_food(
     summary="Crear nueva receta",
     description="Crea una receta con ingredientes y calcula automáticamente sus valores nutricionales."
 )
-def api_create_recipe(recipe: Recipe = Body(..., description="Datos de la receta a crear")):
+async def api_create_recipe(recipe: Recipe = Body(..., description="Datos de la receta a crear"), data: DataLayer = Depends(data_layer)):
     """
     Crea una nueva receta especificando:
 
@@ -195,8 +470,8 @@ def api_create_recipe(recipe: Recipe = Body(..., description="Datos de la receta
     El sistema calcula automáticamente los valores nutricionales totales.
     """
     try:
-        db_recipe = create_recipe(recipe)
-        return get_recipe_with_ingredients(db_recipe.id)
+        db_recipe = await data.create_recipe(recipe)
+        return await data.get_recipe_with_ingredients(db_recipe.id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -205,15 +480,30 @@ def api_create_recipe(recipe: Recipe = Body(..., description="Datos de la receta
 
 @app.get("/recipes",
     tags=["recetas"],
-    summary="Listar todas las recetas",
-    description="Obtiene un listado de todas las recetas con sus ingredientes y valores nutricionales."
+    summary="Listar recetas",
+    description="Obtiene un listado de las recetas con sus ingredientes y valores nutricionales, con paginación por cursor y selección de campos."
 )
-def api_get_recipes():
+async def api_get_recipes(request: Request, response: Response, page: Dict = Depends(pagination_params),
+                          ids: Optional[List[int]] = Depends(ids_param), data: DataLayer = Depends(data_layer)):
     """
-    Devuelve todas las recetas registradas, incluyendo ingredientes, cantidades y valores nutricionales.
+    Devuelve las recetas registradas, incluyendo ingredientes, cantidades y valores nutricionales.
+
+    - **after_id**: Cursor; se devuelven las recetas con id mayor
+    - **limit**: Tamaño de página
+    - **fields**: Campos a devolver; sin `ingredients` no se cargan los ingredientes
+    - **ids**: Solo estas recetas, en el orden pedido (las que no existen se omiten)
+
+    Responde con `ETag`; con `If-None-Match` y sin cambios en recetas ni alimentos devuelve 304 sin cuerpo.
     """
+    cached = not_modified(request, response, "recipes", await data.get_table_versions(*LIST_TABLES["recipes"]))
+    if cached:
+        return cached
     try:
-        return get_recipes_with_ingredients()
+        if ids is not None:
+            return list((await data.get_recipes_by_ids(ids, by_ids_page(page))).values())
+        return await data.get_recipes_with_ingredients(**page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("Error al recuperar recetas")
         raise HTTPException(status_code=500, detail="Error al recuperar recetas")
@@ -223,14 +513,15 @@ def api_get_recipes():
     summary="Obtener receta por ID",
     description="Busca y devuelve una receta específica con todos sus detalles."
 )
-def api_get_recipe_by_id(
-    recipe_id: int = Path(..., title="ID de la receta", description="ID único de la receta", ge=1)
+async def api_get_recipe_by_id(
+    recipe_id: int = Path(..., title="ID de la receta", description="ID único de la receta", ge=1),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Recupera una receta completa según su ID, incluyendo ingredientes y valores nutricionales.
     """
     try:
-        recipe = get_recipe_with_ingredients(recipe_id)
+        recipe = await data.get_recipe_with_ingredients(recipe_id)
         if not recipe:
             raise HTTPException(status_code=404, detail=f"Receta con ID {recipe_id} no encontrada")
         return recipe
@@ -245,17 +536,20 @@ def api_get_recipe_by_id(
     summary="Actualizar receta",
     description="Modifica los datos de una receta existente y recalcula sus valores nutricionales."
 )
-def api_update_recipe(
+async def api_update_recipe(
     recipe_id: int = Path(..., title="ID de la receta", description="ID único de la receta", ge=1),
-    recipe: Recipe = Body(..., description="Nuevos datos de la receta")
+    recipe: Recipe = Body(..., description="Nuevos datos de la receta"),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Actualiza una receta existente con nuevos ingredientes y cantidades.
-    Se recalculan automáticamente los valores nutricionales.
+    Se recalculan automáticamente los valores nutricionales, y también los de las comidas
+    que incluyen la receta (`recomputed`).
     """
     try:
-        update_recipe(recipe_id, recipe)
-        return get_recipe_with_ingredients(recipe_id)
+        db_recipe = await data.update_recipe(recipe_id, recipe)
+        updated = await data.get_recipe_with_ingredients(recipe_id)
+        return {**updated, "recomputed": db_recipe.recomputed}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -267,14 +561,15 @@ def api_update_recipe(
     summary="Eliminar receta",
     description="Elimina permanentemente una receta de la base de datos."
 )
-def api_delete_recipe(
-    recipe_id: int = Path(..., title="ID de la receta", description="ID único de la receta", ge=1)
+async def api_delete_recipe(
+    recipe_id: int = Path(..., title="ID de la receta", description="ID único de la receta", ge=1),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Elimina una receta según su ID. Esta operación no se puede deshacer.
     """
     try:
-        if delete_recipe(recipe_id):
+        if await data.delete_recipe(recipe_id):
             return {"mensaje": f"Receta con ID {recipe_id} eliminada correctamente"}
         raise HTTPException(status_code=404, detail=f"Receta con ID {recipe_id} no encontrada")
     except HTTPException:
@@ -290,7 +585,7 @@ def api_delete_recipe(
     summary="Registrar nueva comida",
     description="Registra una comida para una fecha específica con alimentos y recetas consumidos."
 )
-def api_create_meal(meal: Meal = Body(..., description="Datos de la comida a registrar")):
+async def api_create_meal(meal: Meal = Body(..., description="Datos de la comida a registrar"), data: DataLayer = Depends(data_layer)):
     """
     Registra una nueva comida especificando:
 
@@ -301,8 +596,8 @@ def api_create_meal(meal: Meal = Body(..., description="Datos de la comida a reg
     El sistema calcula automáticamente los valores nutricionales totales.
     """
     try:
-        db_meal = create_meal(meal)
-        return get_meal_with_items(db_meal.id)
+        db_meal = await data.create_meal(meal)
+        return await data.get_meal_with_items(db_meal.id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -311,15 +606,41 @@ def api_create_meal(meal: Meal = Body(..., description="Datos de la comida a reg
 
 @app.get("/meals",
     tags=["comidas"],
-    summary="Listar todas las comidas",
-    description="Obtiene un listado de todas las comidas registradas con sus componentes."
+    summary="Listar comidas",
+    description="Obtiene un listado de las comidas registradas con sus componentes, opcionalmente filtrado por rango de fechas."
 )
-def api_get_meals():
+async def api_get_meals(
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from", description="Fecha inicial incluida (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Fecha final incluida (YYYY-MM-DD)"),
+    page: Dict = Depends(pagination_params),
+    expand: bool = Depends(expand_param),
+    data: DataLayer = Depends(data_layer)
+):
     """
-    Devuelve todas las comidas registradas, incluyendo fecha, componentes y valores nutricionales.
+    Devuelve las comidas registradas, incluyendo fecha, componentes y valores nutricionales.
+
+    - **from**: Fecha inicial del rango (opcional)
+    - **to**: Fecha final del rango (opcional)
+    - **after_id** / **limit**: Paginación por cursor (ordenada por id)
+    - **fields**: Campos a devolver; sin `items` no se cargan los componentes
+    - **expand**: `components` añade `name` y `nutrients` (escalados a la cantidad) a cada componente,
+      leídos con una sola consulta; así no hace falta descargar `/foods` y `/recipes` para mostrarlos
+
+    Sin parámetros devuelve el historial completo. Responde con `ETag` y 304 si no hay cambios.
     """
+    validar_rango_fechas(date_from, date_to)
+    resource = "meals_expanded" if expand else "meals"
+    cached = not_modified(request, response, resource, await data.get_table_versions(*LIST_TABLES[resource]))
+    if cached:
+        return cached
     try:
-        return get_meals_with_items()
+        if date_from is None and date_to is None and all(v is None for v in page.values()):
+            return await data.get_meals_with_items(expand)
+        return await data.get_meals_in_range(date_from, date_to, **page, expand=expand)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("Error al recuperar comidas")
         raise HTTPException(status_code=500, detail="Error al recuperar comidas")
@@ -329,14 +650,17 @@ def api_get_meals():
     summary="Obtener comida por ID",
     description="Busca y devuelve una comida específica con todos sus componentes."
 )
-def api_get_meal_by_id(
-    meal_id: int = Path(..., title="ID de la comida", description="ID único de la comida", ge=1)
+async def api_get_meal_by_id(
+    meal_id: int = Path(..., title="ID de la comida", description="ID único de la comida", ge=1),
+    expand: bool = Depends(expand_param),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Recupera una comida completa según su ID, incluyendo todos sus componentes y nutrientes.
+    Con `expand=components` cada componente incluye su nombre y sus nutrientes.
     """
     try:
-        meal = get_meal_with_items(meal_id)
+        meal = await data.get_meal_with_items(meal_id, expand)
         if not meal:
             raise HTTPException(status_code=404, detail=f"Comida con ID {meal_id} no encontrada")
         return meal
@@ -374,17 +698,18 @@ def api_get_meals_by_date(
     summary="Actualizar comida",
     description="Modifica los datos de una comida existente y recalcula sus valores nutricionales."
 )
-def api_update_meal(
+async def api_update_meal(
     meal_id: int = Path(..., title="ID de la comida", description="ID único de la comida", ge=1),
-    meal: Meal = Body(..., description="Nuevos datos de la comida")
+    meal: Meal = Body(..., description="Nuevos datos de la comida"),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Actualiza una comida existente con nuevos componentes.
     Se recalculan automáticamente los valores nutricionales.
     """
     try:
-        update_meal(meal_id, meal)
-        return get_meal_with_items(meal_id)
+        await data.update_meal(meal_id, meal)
+        return await data.get_meal_with_items(meal_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -396,18 +721,155 @@ def api_update_meal(
     summary="Eliminar comida",
     description="Elimina permanentemente una comida de la base de datos."
 )
-def api_delete_meal(
-    meal_id: int = Path(..., title="ID de la comida", description="ID único de la comida", ge=1)
+async def api_delete_meal(
+    meal_id: int = Path(..., title="ID de la comida", description="ID único de la comida", ge=1),
+    data: DataLayer = Depends(data_layer)
 ):
     """
     Elimina una comida según su ID. Esta operación no se puede deshacer.
     """
     try:
-        if delete_meal(meal_id):
+        if await data.delete_meal(meal_id):
             return {"mensaje": f"Comida con ID {meal_id} eliminada correctamente"}
         raise HTTPException(status_code=404, detail=f"Comida con ID {meal_id} no encontrada")
     except HTTPException:
         raise
     except Exception as e:
         logger.exception(f"Error al eliminar comida id={meal_id}")
-        raise HTTPException(status_code=500, detail="Error al eliminar comida")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error al eliminar comida")
+
+# ---------------------- Stats Endpoints ----------------------
+
+@app.get("/stats/daily",
+    tags=["estadisticas"],
+    summary="Totales nutricionales por día",
+    description="Suma los nutrientes de las comidas de cada día directamente en la base de datos."
+)
+def api_get_daily_stats(
+    date_from: Optional[date] = Query(None, alias="from", description="Fecha inicial incluida (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Fecha final incluida (YYYY-MM-DD)")
+):
+    """
+    Devuelve una fila por día con comidas registradas:
+
+    - **meal_date**: Fecha
+    - **meals**: Número de comidas del día
+    - **nutrients**: Suma de kcal, proteínas, grasas y carbohidratos
+    """
+    validar_rango_fechas(date_from, date_to)
+    try:
+        return get_daily_nutrient_totals(date_from, date_to)
+    except Exception as e:
+        logger.exception("Error al calcular estadísticas diarias")
+        raise HTTPException(status_code=500, detail="Error al calcular estadísticas diarias")
+
+@app.get("/stats/weekly",
+    tags=["estadisticas"],
+    summary="Totales nutricionales por semana",
+    description="Suma los nutrientes de las comidas de cada semana (de lunes a domingo) en la base de datos."
+)
+def api_get_weekly_stats(
+    date_from: Optional[date] = Query(None, alias="from", description="Fecha inicial incluida (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Fecha final incluida (YYYY-MM-DD)")
+):
+    """
+    Devuelve una fila por semana con comidas registradas:
+
+    - **week_start**: Lunes de la semana
+    - **days**: Días con al menos una comida
+    - **meals**: Número de comidas de la semana
+    - **nutrients**: Suma de kcal, proteínas, grasas y carbohidratos
+    """
+    validar_rango_fechas(date_from, date_to)
+    try:
+        return get_weekly_nutrient_totals(date_from, date_to)
+    except Exception as e:
+        logger.exception("Error al calcular estadísticas semanales")
+        raise HTTPException(status_code=500, detail="Error al calcular estadísticas semanales")
+
+@app.get("/stats/food-catalog",
+    tags=["estadisticas"],
+    summary="Estado de la caché de alimentos",
+    description="Tamaño y contadores de aciertos/fallos de la caché en proceso del catálogo de alimentos."
+)
+def api_get_food_catalog_stats():
+    """
+    Devuelve el estado de la caché de alimentos del proceso que atiende la petición.
+    """
+    return food_catalog.stats()
+
+# ---------------------- Job Endpoints ----------------------
+
+@app.post("/jobs/{kind}",
+    tags=["trabajos"],
+    summary="Lanzar trabajo en segundo plano",
+    description="Encola una operación larga y responde al momento con el trabajo creado.",
+    status_code=202
+)
+def api_submit_job(
+    kind: str = Path(..., description=f"Tipo de trabajo: {', '.join(jobs.JOB_KINDS)}"),
+    params: Dict = Body(default={}, description="Parámetros del trabajo, p. ej. {\"foods\": [...]} para import_foods")
+):
+    """
+    Lanza una operación larga sin bloquear el worker que atiende la petición.
+
+    - **rebuild_totals**: reconstruye el resumen diario de nutrientes
+    - **recompute_nutrients**: recalcula los nutrientes guardados de recetas y comidas (`batch_size` opcional)
+    - **import_foods**: crea en bloque los alimentos de `foods`
+
+    El progreso y el resultado se consultan con `GET /jobs/{id}`.
+    """
+    try:
+        return jobs.submit_job(kind, params)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Error al lanzar el trabajo {kind}")
+        raise HTTPException(status_code=500, detail="Error al lanzar el trabajo")
+
+@app.get("/jobs/{job_id}",
+    tags=["trabajos"],
+    summary="Estado de un trabajo",
+    description="Devuelve estado, progreso y resultado de un trabajo en segundo plano."
+)
+def api_get_job(
+    job_id: int = Path(..., title="ID del trabajo", description="ID único del trabajo", ge=1)
+):
+    """
+    Estado (`pending`, `running`, `done`, `failed`), progreso entre 0 y 1, resultado o error del trabajo.
+    """
+    try:
+        job = get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Trabajo con ID {job_id} no encontrado")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error al recuperar trabajo id={job_id}")
+        raise HTTPException(status_code=500, detail="Error al recuperar trabajo")
+
+# ---------------------- Export Endpoints ----------------------
+
+def ndjson_lines(rows):
+    # Una línea JSON por fila, sin construir la lista completa en memoria
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+@app.get("/export/{table}.ndjson",
+    tags=["exportacion"],
+    summary="Exportar tabla en NDJSON",
+    description="Descarga todos los alimentos, recetas o comidas como JSON delimitado por saltos de línea."
+)
+def api_export_ndjson(
+    table: Literal["foods", "recipes", "meals"] = Path(..., description="Tabla a exportar: foods, recipes o meals")
+):
+    """
+    Exporta la tabla indicada en streaming, una fila por línea, con el mismo formato que los listados.
+    El uso de memoria es constante sea cual sea el tamaño de la tabla.
+    """
+    return StreamingResponse(
+        ndjson_lines(EXPORTERS[table]()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{table}.ndjson"'}
+    )
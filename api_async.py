@@ -0,0 +1,41 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.routing import APIRoute
+
+import async_db_config as adb
+import jobs
+from db_config import upgrade_db, load_food_catalog
+from api import app as sync_app
+
+# Modo asíncrono opcional de la API (requiere aiosqlite):
+# uvicorn api_async:app
+#
+# Sirve las mismas rutas que api.py. Los endpoints CRUD de alimentos, recetas y comidas leen y
+# escriben con async_db_config (app.state.data) en lugar de con db_config en el threadpool: la E/S
+# con la base de datos la hace aiosqlite en el bucle de eventos y esas peticiones no ocupan hilos.
+# El resto de endpoints (importación, estadísticas, exportación...) son los síncronos de api.py.
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    upgrade_db()
+    load_food_catalog()
+    jobs.start()
+    yield
+    jobs.shutdown()
+    await adb.async_engine.dispose()
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    title=sync_app.title,
+    description=sync_app.description,
+    version=sync_app.version,
+    openapi_tags=sync_app.openapi_tags,
+)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.state.data = adb
+
+# Mismas rutas y en el mismo orden que api.py (importa en rutas como /foods/bulk frente a /foods/{food_id})
+app.router.routes.extend(route for route in sync_app.routes if isinstance(route, APIRoute))
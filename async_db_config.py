@@ -0,0 +1,141 @@
+from typing import Iterable, List, Optional, Dict, Tuple, Union
+from datetime import date
+from contextlib import asynccontextmanager
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import db_config
+from db_config import Food, Recipe, Meal
+
+
+# ----------------------
+# Async database configuration
+# ----------------------
+# Drivers asíncronos por backend (pip install aiosqlite / asyncpg)
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def to_async_url(url):
+    # Misma base de datos que db_config, accedida con el driver asíncrono de su backend
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def create_async_db_engine(url=db_config.DATABASE_URL, profile: str = db_config.SQLITE_PROFILE):
+    url = to_async_url(url)
+    pool = {"pool_size": db_config.DB_POOL_SIZE, "max_overflow": db_config.DB_MAX_OVERFLOW}
+    if url.get_backend_name() != "sqlite":
+        return create_async_engine(url, pool_pre_ping=True, **pool)
+
+    engine = create_async_engine(url, connect_args={"timeout": db_config.SQLITE_BUSY_TIMEOUT}, **pool)
+    db_config.apply_sqlite_profile(engine.sync_engine, profile)
+    return engine
+
+
+async_engine = create_async_db_engine()
+# expire_on_commit=False: los objetos devueltos se leen fuera de la sesión sin nuevas consultas
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Context manager asíncrono equivalente a db_config.get_db
+@asynccontextmanager
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def _run(operation, *args):
+    # Ejecuta una operación _nombre(db, ...) de db_config sobre una sesión asíncrona.
+    # La E/S con SQLite la hace aiosqlite, sin ocupar un hilo del threadpool por petición.
+    async with get_async_db() as db:
+        return await db.run_sync(operation, *args)
+
+
+async def get_table_versions(*tables: str) -> Tuple[Optional[int], ...]:
+    return await _run(db_config._get_table_versions, tables)
+
+
+# ---------------------- CRUD para FoodDB ----------------------
+async def create_food(food: Food):
+    return await _run(db_config._create_food, food)
+
+
+async def get_food_by_id(food_id: int):
+    return await _run(db_config._get_food_by_id, food_id)
+
+
+async def get_foods_page(after_id: Optional[int] = None, limit: Optional[int] = None,
+                         fields: Optional[Union[str, List[str]]] = None) -> List[Dict]:
+    return await _run(db_config._get_foods_page, after_id, limit, fields)
+
+
+async def get_foods_by_ids(ids: Iterable[int], fields: Optional[Union[str, List[str]]] = None) -> Dict[int, Dict]:
+    return await _run(db_config._get_foods_by_ids, ids, fields)
+
+
+async def search_foods(ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                       category: Optional[str] = None, sort: Optional[str] = None, limit: int = 50,
+                       fields: Optional[Union[str, List[str]]] = None, q: Optional[str] = None) -> List[Dict]:
+    return await _run(db_config._search_foods, ranges, category, sort, limit, fields, q)
+
+
+async def update_food(food_id: int, updated_data: Food):
+    return await _run(db_config._update_food, food_id, updated_data)
+
+
+async def delete_food(food_id: int):
+    return await _run(db_config._delete_food, food_id)
+
+
+# ---------------------- CRUD para RecipeDB ----------------------
+async def create_recipe(recipe: Recipe):
+    return await _run(db_config._create_recipe, recipe)
+
+
+async def get_recipe_with_ingredients(recipe_id: int):
+    return await _run(db_config._get_recipe_with_ingredients, recipe_id)
+
+
+async def get_recipes_with_ingredients(after_id: Optional[int] = None, limit: Optional[int] = None,
+                                       fields: Optional[Union[str, List[str]]] = None):
+    return await _run(db_config._get_recipes_with_ingredients, after_id, limit, fields)
+
+
+async def get_recipes_by_ids(ids: Iterable[int], fields: Optional[Union[str, List[str]]] = None) -> Dict[int, Dict]:
+    return await _run(db_config._get_recipes_by_ids, ids, fields)
+
+
+async def update_recipe(recipe_id: int, updated_data: Recipe):
+    return await _run(db_config._update_recipe, recipe_id, updated_data)
+
+
+async def delete_recipe(recipe_id: int):
+    return await _run(db_config._delete_recipe, recipe_id)
+
+
+# ---------------------- CRUD para MealDB ----------------------
+async def create_meal(meal: Meal):
+    return await _run(db_config._create_meal, meal)
+
+
+async def get_meal_with_items(meal_id: int, expand: bool = False):
+    return await _run(db_config._get_meal_with_items, meal_id, expand)
+
+
+async def get_meals_with_items(expand: bool = False):
+    return await _run(db_config._get_meals_with_items, expand)
+
+
+async def get_meals_in_range(start: Optional[date] = None, end: Optional[date] = None,
+                             after_id: Optional[int] = None, limit: Optional[int] = None,
+                             fields: Optional[Union[str, List[str]]] = None, expand: bool = False):
+    return await _run(db_config._get_meals_in_range, start, end, after_id, limit, fields, expand)
+
+
+async def update_meal(meal_id: int, updated_data: Meal):
+    return await _run(db_config._update_meal, meal_id, updated_data)
+
+
+async def delete_meal(meal_id: int):
+    return await _run(db_config._delete_meal, meal_id)
@@ -0,0 +1,78 @@
+"""
+Prueba de carga de la API: peticiones concurrentes de lectura como las del planificador.
+
+Lanza la API en modo síncrono y asíncrono y mide ambas con la misma carga:
+
+    uvicorn api:app --port 8000
+    uvicorn api_async:app --port 8001
+    python benchmark_api.py --url http://localhost:8000 --url http://localhost:8001
+
+Cada URL recibe el mismo número de peticiones con la misma concurrencia.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import requests
+
+
+def rutas_planificador():
+    # Lo que pide el planificador al abrir la semana actual
+    lunes = date.today() - timedelta(days=date.today().weekday())
+    domingo = lunes + timedelta(days=6)
+    return [
+        f"/meals?from={lunes.isoformat()}&to={domingo.isoformat()}",
+        "/recipes?fields=id,name,nutrients",
+        "/foods?fields=id,name,category,unit,nutrients&limit=200",
+        f"/stats/daily?from={lunes.isoformat()}&to={domingo.isoformat()}",
+    ]
+
+
+def medir(base_url, rutas, total, concurrencia):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrencia, pool_maxsize=concurrencia)
+    session.mount("http://", adapter)
+
+    def peticion(i):
+        inicio = time.perf_counter()
+        response = session.get(base_url + rutas[i % len(rutas)], timeout=30)
+        return time.perf_counter() - inicio, response.status_code
+
+    # Calentamiento: carga la caché de alimentos y abre conexiones
+    for ruta in rutas:
+        session.get(base_url + ruta, timeout=30)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(peticion, range(total)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(t for t, _ in resultados)
+    return {
+        "url": base_url,
+        "peticiones": total,
+        "errores": sum(1 for _, status in resultados if status != 200),
+        "req_s": total / duracion,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de nutrición")
+    parser.add_argument("--url", action="append", help="URL base de la API (repetible)")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por URL")
+    parser.add_argument("--concurrency", type=int, default=64, help="Peticiones simultáneas")
+    args = parser.parse_args()
+
+    rutas = rutas_planificador()
+    print(f"{'URL':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8}")
+    for base_url in args.url or ["http://localhost:8000"]:
+        r = medir(base_url.rstrip("/"), rutas, args.requests, args.concurrency)
+        print(f"{r['url']:<28} {r['req_s']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['errores']:>8}")
+
+
+if __name__ == "__main__":
+    main()
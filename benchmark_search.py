@@ -0,0 +1,111 @@
+"""
+Búsqueda de alimentos por texto y nutrientes sobre un catálogo sintético grande.
+
+    python benchmark_search.py --foods 100000 --repeat 20
+
+Compara search_foods (filtro y orden en SQL con índices, texto con FTS5) con descargar el
+catálogo completo y filtrarlo en Python, que es lo que hacía el frontend. Usa una base de datos temporal.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import db_config
+from db_config import autocomplete_foods, bulk_create_foods, get_foods_page, load_food_catalog, search_foods
+
+CATEGORIAS = ["Carnes", "Pescados", "Verduras", "Frutas", "Lácteos", "Cereales", "Legumbres", "Aceites"]
+NOMBRES = ["Plátano", "Piña", "Pechuga de pollo", "Calamar, Sepia", "Pan de trigo", "Lentejas", "Queso", "Tomate"]
+VARIANTES = ["crudo", "cocido", "a la plancha", "en conserva", "integral", "light"]
+
+CONSULTAS = {
+    "proteico y ligero": dict(ranges={"protein_g": (20, None), "kcal": (None, 150)}, sort="-protein_g"),
+    "categoría por kcal": dict(category="Verduras", sort="kcal"),
+    "bajo en grasa": dict(ranges={"fat_g": (None, 1)}, sort="-protein_g"),
+    "texto": dict(q="pechuga plancha"),
+    "texto y nutrientes": dict(q="lentejas", ranges={"kcal": (None, 300)}, sort="-protein_g"),
+}
+
+
+def preparar(path, n_alimentos):
+    db_config.engine = db_config.create_db_engine(f"sqlite:///{path}")
+    db_config.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_config.engine)
+    db_config.Base.metadata.create_all(bind=db_config.engine)
+    db_config.food_catalog.invalidate()
+
+    rnd = random.Random(42)
+    bulk_create_foods([
+        {
+            "name": f"{rnd.choice(NOMBRES)} {rnd.choice(VARIANTES)} {i}",
+            "category": rnd.choice(CATEGORIAS),
+            "nutrients": {
+                "kcal": round(rnd.uniform(10, 900), 1),
+                "protein_g": round(rnd.uniform(0, 40), 1),
+                "fat_g": round(rnd.uniform(0, 100), 1),
+                "carbs_g": round(rnd.uniform(0, 80), 1),
+            },
+        }
+        for i in range(n_alimentos)
+    ])
+    with db_config.engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def filtrar_en_python(ranges=None, category=None, sort=None, limit=50, q=None):
+    # Lo que hacía el cliente: catálogo completo y filtro/orden en memoria
+    alimentos = get_foods_page()
+    for palabra in (q or "").lower().split():
+        alimentos = [a for a in alimentos if palabra in a["name"].lower()]
+    for key, (low, high) in (ranges or {}).items():
+        alimentos = [a for a in alimentos
+                     if (low is None or a["nutrients"][key] >= low) and (high is None or a["nutrients"][key] <= high)]
+    if category is not None:
+        alimentos = [a for a in alimentos if a["category"] == category]
+    if sort:
+        campo = sort.lstrip("-")
+        alimentos.sort(key=lambda a: a["nutrients"][campo], reverse=sort.startswith("-"))
+    return alimentos[:limit]
+
+
+def medir(funcion, repeticiones, **consulta):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(**consulta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de alimentos por nutrientes")
+    parser.add_argument("--foods", type=int, default=100000, help="Tamaño del catálogo sintético")
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones por consulta (se usa la mediana)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inicio = time.perf_counter()
+        preparar(os.path.join(tmp, "search.db"), args.foods)
+        print(f"Catálogo de {args.foods} alimentos creado en {time.perf_counter() - inicio:.1f} s\n")
+
+        print(f"{'Consulta':<22} {'SQL ms':>9} {'Python ms':>10}")
+        for nombre, consulta in CONSULTAS.items():
+            sql_ms = medir(search_foods, args.repeat, **consulta)
+            python_ms = medir(filtrar_en_python, max(1, args.repeat // 10), **consulta)
+            print(f"{nombre:<22} {sql_ms:>9.2f} {python_ms:>10.1f}")
+
+        inicio = time.perf_counter()
+        load_food_catalog()
+        print(f"\nÍndice de autocompletado cargado en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        print(f"{'Prefijo':<22} {'memoria ms':>10}")
+        for prefijo in ("p", "pech", "platano cru", "plancha"):
+            print(f"{prefijo:<22} {medir(autocomplete_foods, args.repeat * 10, prefix=prefijo):>10.3f}")
+        db_config.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Rendimiento de lecturas y escrituras concurrentes con cada perfil de SQLite de db_config.
+
+    python benchmark_sqlite.py --seconds 10 --readers 8 --writers 2
+
+Cada perfil se mide sobre una base de datos temporal con los mismos datos: los lectores
+consultan las comidas de una semana y recetas con ingredientes, los escritores registran
+comidas nuevas. No modifica data/food.db.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+import db_config
+from db_config import (
+    Food, Recipe, Meal, Nutrients, SQLITE_PROFILES,
+    bulk_create_foods, create_recipe, create_meal, get_meals_in_range, get_recipes_with_ingredients,
+)
+
+INICIO = date(2025, 1, 6)
+
+
+def preparar(profile, path, n_alimentos=500, n_recetas=50, n_comidas=1000):
+    db_config.engine = db_config.create_db_engine(f"sqlite:///{path}", profile)
+    db_config.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_config.engine)
+    db_config.Base.metadata.create_all(bind=db_config.engine)
+    db_config.food_catalog.invalidate()
+
+    bulk_create_foods([
+        Food(name=f"Alimento {i}", nutrients=Nutrients(kcal=i % 400, protein_g=i % 30, fat_g=i % 20, carbs_g=i % 50))
+        for i in range(n_alimentos)
+    ])
+    for i in range(n_recetas):
+        create_recipe(Recipe(
+            name=f"Receta {i}", description="",
+            ingredient_quantities={f"Alimento {(i * 7 + j) % n_alimentos}": 50 + j for j in range(6)},
+        ))
+    for i in range(n_comidas):
+        create_meal(nueva_comida(i))
+
+
+def nueva_comida(i):
+    return Meal(
+        meal_date=INICIO + timedelta(days=i % 120),
+        recipes=[f"Receta {i % 50}"],
+        foods=[{f"Alimento {i % 500}": 100}],
+    )
+
+
+def ejecutar(segundos, lectores, escritores):
+    fin = time.perf_counter() + segundos
+
+    def lector(n):
+        hechas, errores = 0, 0
+        while time.perf_counter() < fin:
+            semana = INICIO + timedelta(days=7 * (hechas % 16))
+            try:
+                get_meals_in_range(semana, semana + timedelta(days=6))
+                get_recipes_with_ingredients(limit=20)
+                hechas += 1
+            except Exception:
+                errores += 1
+        return "lectura", hechas, errores
+
+    def escritor(n):
+        hechas, errores = 0, 0
+        while time.perf_counter() < fin:
+            try:
+                create_meal(nueva_comida(n * 100000 + hechas))
+                hechas += 1
+            except Exception:
+                errores += 1
+        return "escritura", hechas, errores
+
+    with ThreadPoolExecutor(max_workers=lectores + escritores) as pool:
+        tareas = [pool.submit(lector, n) for n in range(lectores)]
+        tareas += [pool.submit(escritor, n) for n in range(escritores)]
+        resultados = [t.result() for t in tareas]
+
+    totales = {"lectura": [0, 0], "escritura": [0, 0]}
+    for tipo, hechas, errores in resultados:
+        totales[tipo][0] += hechas
+        totales[tipo][1] += errores
+    return totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de perfiles de SQLite")
+    parser.add_argument("--seconds", type=float, default=10, help="Duración de cada medición")
+    parser.add_argument("--readers", type=int, default=8, help="Hilos lectores")
+    parser.add_argument("--writers", type=int, default=2, help="Hilos escritores")
+    parser.add_argument("--profile", action="append", choices=list(SQLITE_PROFILES), help="Perfiles a medir (repetible)")
+    args = parser.parse_args()
+
+    print(f"{'Perfil':<12} {'lecturas/s':>11} {'escrituras/s':>13} {'errores':>8}")
+    for profile in args.profile or list(SQLITE_PROFILES):
+        with tempfile.TemporaryDirectory() as tmp:
+            preparar(profile, os.path.join(tmp, "bench.db"))
+            totales = ejecutar(args.seconds, args.readers, args.writers)
+            db_config.engine.dispose()
+        lecturas, escrituras = totales["lectura"], totales["escritura"]
+        print(
+            f"{profile:<12} {lecturas[0] / args.seconds:>11.1f} {escrituras[0] / args.seconds:>13.1f}"
+            f" {lecturas[1] + escrituras[1]:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
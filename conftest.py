@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import db_config
+
+# test_endpoints.py es un script contra la API en marcha y resetea data/food.db al importarse
+collect_ignore = ["test_endpoints.py"]
+
+
+# TEST_DATABASE_URL=postgresql+psycopg2://... ejecuta las pruebas contra una base de datos PostgreSQL
+# desechable (se borran sus tablas); sin ella se usa un SQLite temporal por prueba
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def test_db(tmp_path, monkeypatch):
+    """Base de datos temporal enlazada a las funciones CRUD de db_config"""
+    engine = db_config.create_db_engine(TEST_DATABASE_URL or f"sqlite:///{tmp_path / 'test.db'}")
+    db_config.Base.metadata.drop_all(bind=engine)
+    db_config.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(db_config, "engine", engine)
+    monkeypatch.setattr(db_config, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    db_config.food_catalog.invalidate()
+    yield engine
+    db_config.food_catalog.invalidate()
+    engine.dispose()
+
+
+@pytest.fixture
+def query_counter(test_db):
+    """Cuenta las sentencias SQL ejecutadas contra la base de datos de prueba"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_db, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(test_db, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def async_test_db(test_db, monkeypatch):
+    """Sesiones asíncronas (aiosqlite/asyncpg) sobre la misma base de datos temporal que test_db"""
+    import asyncio
+    import async_db_config
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    pytest.importorskip(async_db_config.to_async_url(test_db.url).get_driver_name())
+    engine = async_db_config.create_async_db_engine(test_db.url)
+    monkeypatch.setattr(async_db_config, "async_engine", engine)
+    monkeypatch.setattr(
+        async_db_config, "AsyncSessionLocal",
+        async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    )
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def other_process(test_db):
+    """Ejecuta código en otro proceso de Python sobre la misma base de datos (otro worker, la CLI...)"""
+    def run(code):
+        env = {**os.environ, "DATABASE_URL": test_db.url.render_as_string(hide_password=False)}
+        subprocess.run(
+            [sys.executable, "-c", "from db_config import *\n" + code],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True,
+        )
+    return run
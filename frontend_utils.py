@@ -1,22 +1,92 @@
+import os
+import threading
 import requests
 import streamlit as st
 import pandas as pd
 from datetime import date, timedelta
 import plotly.express as px
-from typing import List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 
 # Configuración de la API
 API_URL = "http://127.0.0.1:8000"
+# Segundos para abrir la conexión y para esperar la respuesta
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT", "3")), float(os.getenv("API_READ_TIMEOUT", "30")))
+# Reintentos ante fallos de conexión y 502/503/504, con espera creciente (0.3 s, 0.6 s, 1.2 s...)
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+# Conexiones abiertas que se reutilizan entre peticiones (una por hilo que llame a la vez)
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+
+# Última respuesta con ETag por endpoint: sobrevive a clear_caches() para poder revalidar
+# con If-None-Match y recibir un 304 sin cuerpo si los datos no han cambiado. Se guardan las
+# MAX_RESPUESTAS_ETAG usadas más recientemente (cada semana o lote de ids es un endpoint distinto)
+MAX_RESPUESTAS_ETAG = 200
+_respuestas_etag = OrderedDict()
+_respuestas_etag_lock = threading.Lock()
+
+
+def _respuesta_etag(endpoint):
+    with _respuestas_etag_lock:
+        guardada = _respuestas_etag.get(endpoint)
+        if guardada:
+            _respuestas_etag.move_to_end(endpoint)
+        return guardada
+
+
+def _guardar_respuesta_etag(endpoint, etag, datos):
+    with _respuestas_etag_lock:
+        _respuestas_etag[endpoint] = (etag, datos)
+        _respuestas_etag.move_to_end(endpoint)
+        while len(_respuestas_etag) > MAX_RESPUESTAS_ETAG:
+            _respuestas_etag.popitem(last=False)
+
+
+@st.cache_resource
+def _sesion_http():
+    """Sesión HTTP compartida por todo el proceso de Streamlit: mantiene las conexiones abiertas (keep-alive)"""
+    # POST no se reintenta: si la petición llegó a la API se crearía el registro dos veces.
+    # DELETE tampoco: si el primer intento borró el registro, el reintento recibe un 404 y la
+    # interfaz mostraría un error por una operación que sí se hizo
+    reintentos = Retry(
+        total=API_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "PUT"}),
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE, max_retries=reintentos)
+    sesion = requests.Session()
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    sesion.headers["Accept-Encoding"] = "gzip"
+    return sesion
+
+
+def _peticion(metodo, endpoint, **kwargs):
+    return _sesion_http().request(metodo, f"{API_URL}{endpoint}", timeout=API_TIMEOUT, **kwargs)
+
 
 # Funciones de comunicación con la API
 @st.cache_data(ttl=60)
 def fetch_data(endpoint):
     """Función para obtener datos desde la API con caché"""
     try:
-        response = requests.get(f"{API_URL}{endpoint}")
+        guardada = _respuesta_etag(endpoint)
+        headers = {"If-None-Match": guardada[0]} if guardada else {}
+        response = _peticion("GET", endpoint, headers=headers)
+        if response.status_code == 304 and guardada:
+            return guardada[1]
         if response.status_code == 200:
-            return response.json()
+            datos = response.json()
+            if "ETag" in response.headers:
+                _guardar_respuesta_etag(endpoint, response.headers["ETag"], datos)
+            return datos
         else:
             st.error(f"Error en la API: {response.status_code} - {response.text}")
             return None
@@ -24,10 +94,79 @@ def fetch_data(endpoint):
         st.error(f"Error de conexión: {str(e)}")
         return None
 
+@st.cache_resource
+def _pool_peticiones():
+    """Hilos compartidos para lanzar varias peticiones GET a la vez (tantos como conexiones tiene la sesión)"""
+    return ThreadPoolExecutor(max_workers=API_POOL_SIZE, thread_name_prefix="api")
+
+
+def fetch_many(endpoints: Iterable[str]) -> Dict[str, object]:
+    """Obtener varios endpoints a la vez: cuesta lo que la petición más lenta, no la suma de todas.
+    Los endpoints repetidos se piden una sola vez. Devuelve {endpoint: datos} (None si falló)."""
+    pendientes = list(dict.fromkeys(endpoints))
+    if len(pendientes) <= 1:
+        return {endpoint: fetch_data(endpoint) for endpoint in pendientes}
+
+    # Cada hilo usa el contexto del rerun actual para que st.error y la caché funcionen igual
+    contexto = get_script_run_ctx()
+
+    def obtener(endpoint):
+        add_script_run_ctx(ctx=contexto)
+        return fetch_data(endpoint)
+
+    return dict(zip(pendientes, _pool_peticiones().map(obtener, pendientes)))
+
+
+def fetch_by_ids(recurso: str, ids: Iterable[int]) -> Dict[int, dict]:
+    """Obtener varios elementos por id en una sola petición (p. ej. fetch_by_ids("recipes", [3, 5, 3])).
+    Devuelve {id: datos} con los que existen."""
+    # Ordenados para que el mismo conjunto de ids reutilice la caché y el ETag
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    datos = fetch_data(f"/{recurso}?ids={','.join(str(id_) for id_ in ids)}") or []
+    return {elemento['id']: elemento for elemento in datos}
+
+
+class IndiceCatalogo(NamedTuple):
+    """Listado de la API (alimentos, recetas...) indexado para búsquedas O(1) en los formularios"""
+    elementos: List[dict]
+    por_id: Dict[int, dict]
+    por_nombre: Dict[str, dict]
+
+
+def _indexar(datos: List[dict]) -> IndiceCatalogo:
+    return IndiceCatalogo(
+        elementos=datos,
+        por_id={elemento['id']: elemento for elemento in datos},
+        por_nombre={elemento['name']: elemento for elemento in datos},
+    )
+
+
+@st.cache_resource(max_entries=20, show_spinner=False)
+def _indice_por_version(endpoint, version, _datos) -> IndiceCatalogo:
+    # La caché se indexa por (endpoint, ETag): Streamlit no hashea los parámetros que empiezan
+    # por "_", así que cada versión del listado se indexa una sola vez. cache_resource devuelve
+    # siempre el mismo objeto, sin deserializarlo en cada rerun como cache_data: los formularios
+    # solo lo leen y no deben modificarlo
+    return _indexar(_datos)
+
+
+def indice_catalogo(endpoint) -> IndiceCatalogo:
+    """Índice por id y por nombre del listado del endpoint (p. ej. "/foods?fields=id,name,nutrients").
+    El endpoint debe devolver elementos con id y name."""
+    datos = fetch_data(endpoint) or []
+    version = (_respuesta_etag(endpoint) or (None,))[0]
+    if version is None:
+        # Sin ETag no se sabe si los datos han cambiado: se indexa sin guardar en caché
+        return _indexar(datos)
+    return _indice_por_version(endpoint, version, datos)
+
+
 def post_data(endpoint, data):
     """Enviar datos a la API (POST)"""
     try:
-        response = requests.post(f"{API_URL}{endpoint}", json=data)
+        response = _peticion("POST", endpoint, json=data)
         if response.status_code in [200, 201]:
             return response.json()
         else:
@@ -40,7 +179,7 @@ def post_data(endpoint, data):
 def update_data(endpoint, data):
     """Actualizar datos en la API (PUT)"""
     try:
-        response = requests.put(f"{API_URL}{endpoint}", json=data)
+        response = _peticion("PUT", endpoint, json=data)
         if response.status_code == 200:
             return response.json()
         else:
@@ -53,7 +192,7 @@ def update_data(endpoint, data):
 def delete_data(endpoint):
     """Eliminar datos de la API (DELETE)"""
     try:
-        response = requests.delete(f"{API_URL}{endpoint}")
+        response = _peticion("DELETE", endpoint)
         if response.status_code in [200, 204]:
             return True
         else:
@@ -67,3 +206,11 @@ def delete_data(endpoint):
 def clear_caches():
     """Limpiar todas las cachés después de cambios"""
     fetch_data.clear()
+
+
+def autocompletar_alimentos(prefijo, limite=10):
+    """Nombres de alimentos que empiezan por el prefijo, sin descargar el catálogo completo"""
+    if not prefijo or not prefijo.strip():
+        return []
+    sugerencias = fetch_data(f"/foods/autocomplete?{urlencode({'prefix': prefijo.strip(), 'limit': limite})}")
+    return [a['name'] for a in sugerencias or []]
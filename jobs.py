@@ -0,0 +1,142 @@
+"""
+Trabajos en segundo plano dentro del proceso de la API.
+
+Las operaciones largas (recalcular nutrientes, importar alimentos en bloque, reconstruir el
+resumen diario) se ejecutan en un pool de hilos en lugar de en el handler de la petición.
+Cada trabajo se guarda en la tabla jobs con su estado y progreso, así que puede consultarse
+desde cualquier worker de uvicorn con GET /jobs/{id}.
+
+Cada proceso renueva periódicamente el latido (heartbeat_at) de sus trabajos sin terminar. Un
+trabajo pendiente o en marcha sin latidos es de un proceso que ha terminado sin cerrarlo (caída,
+reinicio) y se marca como fallido al arrancar la API y en cada latido.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from db_config import (
+    JobStatusEnum, create_job, update_job, touch_jobs, fail_stale_jobs,
+    bulk_create_foods, rebuild_daily_nutrient_totals, recompute_stored_nutrients,
+)
+
+logger = logging.getLogger("db_logger")
+
+# Hilos por proceso: las operaciones de db_config liberan el GIL mientras esperan a la base de datos
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Segundos entre latidos; sin latido en tres intervalos, el trabajo se da por abandonado
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+
+
+def _rebuild_totals(params: Dict, progress) -> Dict:
+    return {"days": rebuild_daily_nutrient_totals()}
+
+
+def _recompute_nutrients(params: Dict, progress) -> Dict:
+    return recompute_stored_nutrients(batch_size=int(params.get("batch_size", 500)), progress=progress)
+
+
+def _import_foods(params: Dict, progress) -> Dict:
+    if not isinstance(params.get("foods"), list):
+        raise ValueError("Se necesita la lista de alimentos en 'foods'")
+    return bulk_create_foods(params["foods"])
+
+
+# Tipo de trabajo -> función(params, progress) que devuelve el resultado (serializable en JSON)
+JOB_KINDS = {
+    "rebuild_totals": _rebuild_totals,
+    "recompute_nutrients": _recompute_nutrients,
+    "import_foods": _import_foods,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+# Trabajos encolados por este proceso que aún no han terminado
+_futures: Dict[Future, int] = {}
+_heartbeat: Optional[threading.Thread] = None
+_stop_heartbeat = threading.Event()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    return _executor
+
+
+def _params_summary(params: Dict) -> Dict:
+    # Lo que se guarda en jobs.params y devuelve GET /jobs/{id}: las listas (las filas de
+    # import_foods) solo con su tamaño; la lista completa la recibe en memoria el hilo del trabajo
+    return {key: {"rows": len(value)} if isinstance(value, list) else value for key, value in params.items()}
+
+
+def submit_job(kind: str, params: Optional[Dict] = None) -> Dict:
+    """Registra el trabajo como pendiente y lo encola. Devuelve el trabajo sin esperar a que termine."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Tipo de trabajo no válido: {kind}. Permitidos: {', '.join(JOB_KINDS)}")
+    params = params or {}
+    job = create_job(kind, _params_summary(params))
+    future = _get_executor().submit(run_job, job["id"], kind, params)
+    _futures[future] = job["id"]
+    future.add_done_callback(lambda done: _futures.pop(done, None))
+    return job
+
+
+def run_job(job_id: int, kind: str, params: Dict):
+    # Guardar el estado final también puede fallar (resultado no serializable, base de datos
+    # bloqueada): el trabajo queda entonces como fallido en lugar de en marcha para siempre
+    try:
+        update_job(job_id, status=JobStatusEnum.running)
+        result = JOB_KINDS[kind](params, lambda fraction: update_job(job_id, progress=fraction))
+        update_job(job_id, status=JobStatusEnum.done, progress=1.0, result=result)
+    except Exception as e:
+        logger.exception(f"Error en el trabajo {kind} id={job_id}")
+        try:
+            update_job(job_id, status=JobStatusEnum.failed, error=str(e))
+        except Exception:
+            # Sin latidos, fail_stale lo marcará como fallido más adelante
+            logger.exception(f"No se pudo guardar el fallo del trabajo {kind} id={job_id}")
+
+
+def fail_stale() -> int:
+    failed = fail_stale_jobs(3 * JOB_HEARTBEAT_SECONDS)
+    if failed:
+        logger.warning(f"{failed} trabajos abandonados marcados como fallidos")
+    return failed
+
+
+def _beat():
+    while not _stop_heartbeat.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            job_ids = list(_futures.values())
+            if job_ids:
+                touch_jobs(job_ids)
+            fail_stale()
+        except Exception:
+            logger.exception("Error al renovar el latido de los trabajos")
+
+
+def start():
+    """Al arrancar la API: marca como fallidos los trabajos abandonados y empieza a enviar latidos."""
+    global _heartbeat
+    fail_stale()
+    if _heartbeat is None:
+        _stop_heartbeat.clear()
+        _heartbeat = threading.Thread(target=_beat, name="job-heartbeat", daemon=True)
+        _heartbeat.start()
+
+
+def shutdown():
+    # Los trabajos en marcha terminan; los que seguían en cola se cancelan y se marcan como fallidos
+    # (con latidos mientras terminan)
+    global _executor, _heartbeat
+    if _executor is not None:
+        executor, _executor = _executor, None
+        for future, job_id in list(_futures.items()):
+            if future.cancel():
+                update_job(job_id, status=JobStatusEnum.failed, error="Cancelado al detener la API")
+        executor.shutdown(wait=True)
+    if _heartbeat is not None:
+        _stop_heartbeat.set()
+        _heartbeat.join()
+        _heartbeat = None
@@ -1,5 +1,5 @@
 import pandas as pd
-from db_config import create_food, Food, create_recipe, create_meal, Recipe, Meal, init_db
+from db_config import bulk_create_foods, Food, create_recipe, create_meal, Recipe, Meal, init_db
 
 data = pd.read_csv('data/alimentos.csv')
 
@@ -10,14 +10,14 @@ data = pd.read_csv('data/alimentos.csv')
 init_db()
 
 
-# * Rellennamos con los aliemntos scrappeados (alimentos.csv)
+# * Rellennamos con los aliemntos scrappeados (alimentos.csv) en una única transacción
 
-for index, row in data.iterrows():
+foods = []
+for row in data.to_dict('records'):
 
     unit = float(row['Unidad (g)']) if pd.notna(row['Unidad (g)']) else None
-    print(unit, type(unit))
 
-    food = Food(
+    foods.append(Food(
         name=row['Alimento'],
         category=row['Categoría'],
         nutrients={
@@ -25,12 +25,17 @@ for index, row in data.iterrows():
             'protein_g': row['Proteínas'],
             'fat_g': row['Grasa'],
             'carbs_g': row['Carbohidratos'],
+            'fiber_g': row['Fibra'],
+            'cholesterol_mg': row['Colesterol'],
         },
         unit=unit,
         market=row.get('Marca / Supermercado', None)
-    )
+    ))
 
-    created_food = create_food(food)
+result = bulk_create_foods(foods)
+print(f"Alimentos creados: {result['created']}")
+for error in result['errors']:
+    print(f"Fila {error['index']} ({error['name']}) descartada: {error['error']}")
 
 
 
@@ -0,0 +1,131 @@
+from fastapi.testclient import TestClient
+
+from db_config import Food, Nutrients, create_food, update_food
+from test_db_config import crear_alimentos_base, crear_comidas, crear_recetas
+import api
+
+# Sin "with": no se ejecuta el lifespan (upgrade_db) sobre data/food.db
+client = TestClient(api.app)
+
+
+def test_list_etags_answer_304_reading_only_versions(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(1)
+
+    primera = client.get("/foods")
+    etag = primera.headers["etag"]
+    assert primera.status_code == 200 and etag.startswith('W/"')
+
+    query_counter.clear()
+    repetida = client.get("/foods", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304 and repetida.content == b""
+    assert repetida.headers["etag"] == etag
+    assert len(query_counter) == 1 and "FROM table_versions" in query_counter[0]
+    # El cliente puede devolverlo sin el prefijo W/
+    assert client.get("/foods", headers={"If-None-Match": etag[2:]}).status_code == 304
+
+    # Otros parámetros, otro cuerpo, otro ETag
+    assert client.get("/foods?fields=id,name").headers["etag"] != etag
+
+    recetas = client.get("/recipes").headers["etag"]
+    comidas = client.get("/meals").headers["etag"]
+    cebolla = create_food(Food(name="Cebolla", nutrients=Nutrients(kcal=40, protein_g=1, fat_g=0, carbs_g=9)))
+    cambiada = client.get("/foods", headers={"If-None-Match": etag})
+    assert cambiada.status_code == 200 and cambiada.headers["etag"] != etag
+    assert "Cebolla" in {f["name"] for f in cambiada.json()}
+
+    # Las recetas muestran los nutrientes de sus alimentos; las comidas no dependen de ellos
+    update_food(cebolla.id, Food(name="Cebolla", nutrients=Nutrients(kcal=41, protein_g=1, fat_g=0, carbs_g=9)))
+    assert client.get("/recipes", headers={"If-None-Match": recetas}).status_code == 200
+    assert client.get("/meals", headers={"If-None-Match": comidas}).status_code == 304
+
+    # Expandidas incluyen nombres y nutrientes de alimentos y recetas: cambian con ellos
+    expandidas = client.get("/meals?expand=components").headers["etag"]
+    update_food(cebolla.id, Food(name="Cebolla", nutrients=Nutrients(kcal=42, protein_g=1, fat_g=0, carbs_g=9)))
+    assert client.get("/meals?expand=components", headers={"If-None-Match": expandidas}).status_code == 200
+    assert client.get("/meals?expand=otra").status_code == 422
+
+
+def test_large_listings_are_gzipped(test_db):
+    crear_alimentos_base()
+    crear_recetas(3)
+
+    comprimida = client.get("/recipes", headers={"Accept-Encoding": "gzip"})
+    assert comprimida.status_code == 200
+    assert comprimida.headers["content-encoding"] == "gzip"
+    assert len(comprimida.json()) == 3
+
+    plana = client.get("/recipes", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plana.headers
+    assert plana.json() == comprimida.json()
+
+
+def test_get_by_ids(test_db):
+    crear_alimentos_base()
+    crear_recetas(3)
+
+    recetas = client.get("/recipes?ids=3,1,3,99&fields=id,name")
+    assert recetas.status_code == 200
+    assert recetas.json() == [{"id": 3, "name": "Salsa 2"}, {"id": 1, "name": "Salsa 0"}]
+    assert client.get("/recipes?ids=1").json()[0] == client.get("/recipes/1").json()
+    assert [f["name"] for f in client.get("/foods?ids=2").json()] == ["Ajo"]
+
+    # Otros ids, otro ETag
+    assert client.get("/recipes?ids=1").headers["etag"] != client.get("/recipes?ids=2").headers["etag"]
+
+    assert client.get("/foods?ids=1,x").status_code == 400
+    assert client.get("/foods?ids=1&limit=5").status_code == 400
+    assert client.get("/foods?ids=" + ",".join(map(str, range(1, 1002)))).status_code == 400
+
+
+def test_list_etags_follow_writes_from_other_processes(test_db, other_process):
+    crear_alimentos_base()
+    etag = client.get("/foods").headers["etag"]
+
+    other_process(
+        "pepino = create_food(Food(name='Pepino', nutrients=Nutrients(kcal=15, protein_g=1, fat_g=0, carbs_g=3)))\n"
+        "update_food(pepino.id, Food(name='Pepino', nutrients=Nutrients(kcal=16, protein_g=1, fat_g=0, carbs_g=3)))"
+    )
+    respuesta = client.get("/foods", headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200 and respuesta.headers["etag"] != etag
+    assert "Pepino" in {f["name"] for f in respuesta.json()}
+
+
+def test_food_responses_keep_their_shape(test_db):
+    nutrientes = {"kcal": 22, "protein_g": 1, "fat_g": 0, "carbs_g": 4}
+    creado = client.post("/foods", json={"name": "Tomate", "nutrients": nutrientes})
+    assert creado.json() == {"name": "Tomate", "category": None, "unit": None, "market": None, "nutrients": nutrientes}
+
+    (tomate,) = client.get("/foods?fields=id").json()
+    campos = {"id", "name", "category", "unit", "market", "nutrients"}
+    leido = client.get(f"/foods/{tomate['id']}").json()
+    assert set(leido) == campos and leido["nutrients"] == nutrientes
+    actualizado = client.put(f"/foods/{tomate['id']}", json={"name": "Tomate", "nutrients": {**nutrientes, "fiber_g": 1.2}}).json()
+    assert set(actualizado) == campos | {"recomputed"}
+    assert actualizado["nutrients"] == {**nutrientes, "fiber_g": 1.2}
+
+
+def test_update_recipe_reports_recomputed_meals(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+    crear_comidas(2)
+    (receta,) = client.get("/recipes").json()
+
+    cambio = {"name": "Salsa 0", "description": "Más ajo", "ingredient_quantities": {"Tomate": 500, "Ajo": 50}}
+    actualizada = client.put(f"/recipes/{receta['id']}", json=cambio)
+    assert actualizada.status_code == 200
+    assert actualizada.json()["recomputed"] == {"recipes": 0, "meals": 2, "days": 1}
+    assert actualizada.json()["name"] == "Salsa 0"
+
+
+def test_meals_by_date_keep_their_shape(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+    crear_comidas(2)
+
+    comidas = client.get("/meals/date/2025-05-28").json()
+    assert len(comidas) == 2
+    for comida in comidas:
+        assert set(comida) == {"id", "meal_date", "nutrients"}
+        assert set(comida["nutrients"]) == {"kcal", "protein_g", "fat_g", "carbs_g"}
+    assert client.get("/meals/date/2025-05-29").status_code == 404
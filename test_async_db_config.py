@@ -0,0 +1,47 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from db_config import Food, Recipe, Meal, Nutrients, get_meal_with_items, get_daily_nutrient_totals
+from test_db_config import crear_alimentos_base, crear_recetas
+import async_db_config as adb
+
+
+def test_async_crud_matches_sync(async_test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+
+    async def escenario():
+        food = await adb.create_food(Food(name="Cebolla", nutrients=Nutrients(kcal=40, protein_g=1, fat_g=0, carbs_g=9)))
+        recipe = await adb.create_recipe(Recipe(
+            name="Sofrito", description="", ingredient_quantities={"Cebolla": 200, "Tomate": 100}
+        ))
+        meal = await adb.create_meal(Meal(meal_date=date(2025, 5, 28), recipes=["Sofrito"], foods=[{"Ajo": 5}]))
+        return food, recipe, meal
+
+    food, recipe, meal = asyncio.run(escenario())
+    assert food.id is not None and food.name == "Cebolla"
+    assert recipe.nutrients["kcal"] == 102.0
+
+    # Lo escrito por la capa asíncrona se lee igual desde la síncrona
+    assert asyncio.run(adb.get_meal_with_items(meal.id)) == get_meal_with_items(meal.id)
+    assert get_daily_nutrient_totals()[0]["meals"] == 1
+
+    paginas = asyncio.run(adb.get_foods_page(limit=2, fields="id,name"))
+    assert [f["name"] for f in paginas] == ["Tomate", "Ajo"]
+
+
+def test_async_concurrent_reads_and_errors(async_test_db):
+    crear_alimentos_base()
+    crear_recetas(3)
+
+    async def escenario():
+        return await asyncio.gather(*[adb.get_recipe_with_ingredients(i % 3 + 1) for i in range(20)])
+
+    recetas = asyncio.run(escenario())
+    assert [r["id"] for r in recetas[:3]] == [1, 2, 3]
+    assert all(len(r["ingredients"]) == 3 for r in recetas)
+
+    with pytest.raises(ValueError, match="Food not found"):
+        asyncio.run(adb.update_food(999, Food(name="X", nutrients=Nutrients(kcal=0, protein_g=0, fat_g=0, carbs_g=0))))
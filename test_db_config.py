@@ -0,0 +1,682 @@
+from datetime import date
+import sys
+import threading
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from db_config import (
+    Food, Recipe, Meal, Nutrients, NutrientMatrix, food_catalog, get_db,
+    create_food, update_food, delete_food, bulk_create_foods, get_foods, get_foods_page, get_foods_by_ids, search_foods, create_recipe, create_meal, update_meal, delete_meal,
+    get_recipe_with_ingredients, get_recipes_with_ingredients, get_recipes_by_ids,
+    get_meal_with_items, get_meals_with_items, get_meals_in_range,
+    get_daily_nutrient_totals, get_weekly_nutrient_totals, rebuild_daily_nutrient_totals,
+    compute_recipes_nutrients, compute_meals_nutrients, calculate_total_nutrients,
+    iter_foods_export, iter_recipes_export, iter_meals_export,
+)
+import db_config
+
+
+def crear_alimentos_base():
+    alimentos = [
+        ("Tomate", Nutrients(kcal=22, protein_g=1, fat_g=0, carbs_g=4)),
+        ("Ajo", Nutrients(kcal=139, protein_g=7, fat_g=0, carbs_g=28)),
+        ("Aceite de oliva", Nutrients(kcal=900, protein_g=0, fat_g=100, carbs_g=0)),
+    ]
+    for nombre, nutrientes in alimentos:
+        create_food(Food(name=nombre, nutrients=nutrientes))
+
+
+def crear_recetas(n, inicio=0):
+    for i in range(inicio, inicio + n):
+        create_recipe(Recipe(
+            name=f"Salsa {i}",
+            description="Salsa de prueba",
+            ingredient_quantities={"Tomate": 500, "Ajo": 10, "Aceite de oliva": 20},
+        ))
+
+
+def crear_comidas(n, fecha=date(2025, 5, 28)):
+    for _ in range(n):
+        create_meal(Meal(meal_date=fecha, recipes=["Salsa 0"], foods=[{"Ajo": 5}, {"Tomate": 100}]))
+
+
+# -------------------- CONFIGURACIÓN --------------------
+
+def test_sqlite_profiles_set_pragmas(tmp_path):
+    def pragmas(profile):
+        engine = db_config.create_db_engine(f"sqlite:///{tmp_path / profile}.db", profile)
+        with engine.connect() as conn:
+            valores = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "synchronous", "foreign_keys", "temp_store")
+            }
+        engine.dispose()
+        return valores
+
+    # synchronous: 1 = NORMAL, 2 = FULL; temp_store: 2 = MEMORY
+    assert pragmas("performance") == {"journal_mode": "wal", "synchronous": 1, "foreign_keys": 1, "temp_store": 2}
+    assert pragmas("default") == {"journal_mode": "delete", "synchronous": 2, "foreign_keys": 0, "temp_store": 0}
+
+    with pytest.raises(ValueError):
+        db_config.create_db_engine(f"sqlite:///{tmp_path / 'x.db'}", "turbo")
+
+
+def test_models_compile_for_postgresql():
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.schema import CreateTable
+
+    dialect = postgresql.dialect()
+    foods = str(CreateTable(db_config.FoodDB.__table__).compile(dialect=dialect))
+    meal_items = str(CreateTable(db_config.MealItemDB.__table__).compile(dialect=dialect))
+    assert "kcal FLOAT NOT NULL" in foods and "fiber_g FLOAT," in foods
+    assert "component_type VARCHAR(6) NOT NULL" in meal_items
+    assert "quantity NUMERIC(12, 3) NOT NULL" in meal_items
+
+
+def test_migrate_nutrients_from_json_columns(test_db, tmp_path):
+    if test_db.dialect.name != "sqlite":
+        pytest.skip("El esquema anterior solo existió en SQLite")
+    # Esquema anterior: nutrientes como JSON en foods, recipes y meals
+    db_config.Base.metadata.drop_all(bind=test_db)
+    with test_db.begin() as conn:
+        conn.execute(text("CREATE TABLE foods (id INTEGER PRIMARY KEY, category VARCHAR, name VARCHAR NOT NULL UNIQUE, "
+                          "unit INTEGER, market VARCHAR, nutrients JSON NOT NULL)"))
+        conn.execute(text("CREATE TABLE recipes (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, "
+                          "description TEXT, nutrients JSON NOT NULL)"))
+        conn.execute(text("CREATE TABLE meals (id INTEGER PRIMARY KEY, meal_date DATE NOT NULL, nutrients JSON NOT NULL)"))
+        conn.execute(text("INSERT INTO foods (name, nutrients) VALUES "
+                          "('Tomate', '{\"kcal\": 22, \"protein_g\": 1, \"fat_g\": 0, \"carbs_g\": 4}')"))
+        conn.execute(text("INSERT INTO meals (meal_date, nutrients) VALUES "
+                          "('2025-06-02', '{\"kcal\": 300.5, \"protein_g\": 10, \"fat_g\": 5, \"carbs_g\": 40}')"))
+    csv_path = tmp_path / "alimentos.csv"
+    csv_path.write_text("Categoría,Alimento,Calorías,Proteínas,Grasa,Carbohidratos,Fibra,Colesterol,Unidad (g),Marca/Supermercado\n"
+                        "Verduras,Tomate,22,1,0,4,1.2,0,123,\n", encoding="utf-8")
+
+    assert db_config.migrate_nutrient_columns(str(csv_path)) == ["foods", "recipes", "meals"]
+    assert db_config.migrate_nutrient_columns(str(csv_path)) == []
+    db_config.upgrade_db()
+
+    (tomate,) = get_foods()
+    assert tomate.nutrients == {"kcal": 22, "protein_g": 1, "fat_g": 0, "carbs_g": 4, "fiber_g": 1.2, "cholesterol_mg": 0}
+    assert get_meals_with_items()[0]["nutrients"]["kcal"] == 300.5
+    assert get_daily_nutrient_totals()[0]["nutrients"]["kcal"] == 300.5
+    indices = {i["name"] for i in inspect(test_db).get_indexes("foods")}
+    assert {"ix_foods_kcal", "ix_foods_protein_g"} <= indices
+    assert search_foods(q="tomat", fields="name") == [{"name": "Tomate"}]
+
+    # Mismo esquema que una base de datos creada con create_all (sin DEFAULT 0 en las columnas NOT NULL)
+    nueva = create_engine(f"sqlite:///{tmp_path / 'nueva.db'}")
+    db_config.Base.metadata.create_all(bind=nueva)
+    for tabla in ("foods", "recipes", "meals"):
+        columnas = [inspect(e).get_columns(tabla) for e in (test_db, nueva)]
+        migrada, creada = [sorted((c["name"], str(c["type"]), c["nullable"], c["default"]) for c in cs) for cs in columnas]
+        assert migrada == creada
+
+
+# -------------------- MOTOR DE NUTRIENTES --------------------
+
+def test_nutrient_matrix_totals_and_batch():
+    matrix = NutrientMatrix(
+        [{"kcal": 22, "protein_g": 1, "fat_g": 0, "carbs_g": 4},
+         {"kcal": 900, "protein_g": 0, "fat_g": 100, "carbs_g": 0}],
+        ids=[1, 2],
+        names=["Tomate", "Aceite de oliva"],
+    )
+
+    assert matrix.totals({"Tomate": 200, "Aceite de oliva": 10}) == pytest.approx(
+        {"kcal": 134, "protein_g": 2, "fat_g": 10, "carbs_g": 8}
+    )
+    # Claves repetidas y referencias por id
+    assert matrix.totals([(1, 100), ("Tomate", 100)])["kcal"] == pytest.approx(44)
+
+    lotes = matrix.batch_totals([("a", "Tomate", 100), ("b", 2, 50), ("a", 2, 10)])
+    assert lotes["a"]["kcal"] == pytest.approx(112)
+    assert lotes["b"]["fat_g"] == pytest.approx(50)
+
+    assert calculate_total_nutrients([
+        {"nutrients": {"kcal": 22, "protein_g": 1, "fat_g": 0, "carbs_g": 4}, "quantity": 50}
+    ]) == pytest.approx({"kcal": 11, "protein_g": 0.5, "fat_g": 0, "carbs_g": 2})
+
+
+def test_batch_compute_matches_stored_nutrients(test_db):
+    crear_alimentos_base()
+    crear_recetas(3)
+    crear_comidas(4)
+
+    recetas = {r["id"]: r["nutrients"] for r in get_recipes_with_ingredients()}
+    assert compute_recipes_nutrients().keys() == recetas.keys()
+    for recipe_id, nutrients in compute_recipes_nutrients().items():
+        assert nutrients == pytest.approx(recetas[recipe_id])
+
+    comidas = {c["id"]: c["nutrients"] for c in get_meals_with_items()}
+    primera = min(comidas)
+    assert list(compute_meals_nutrients([primera])) == [primera]
+    for meal_id, nutrients in compute_meals_nutrients().items():
+        assert nutrients == pytest.approx(comidas[meal_id])
+
+
+# -------------------- ALIMENTOS --------------------
+
+def test_bulk_create_foods_single_transaction_with_row_errors(test_db, query_counter):
+    create_food(Food(name="Ajo", nutrients=Nutrients(kcal=139, protein_g=7, fat_g=0, carbs_g=28)))
+    nutrientes = {"kcal": 10, "protein_g": 1, "fat_g": 0, "carbs_g": 2}
+    filas = [{"name": f"Alimento {i}", "category": "Pruebas", "nutrients": nutrientes} for i in range(500)]
+    filas += [
+        {"name": "Alimento 3", "nutrients": nutrientes},
+        {"name": "Ajo", "nutrients": nutrientes},
+        {"name": "Sin nutrientes"},
+        {"name": "Negativo", "nutrients": {**nutrientes, "kcal": -1}},
+    ]
+
+    query_counter.clear()
+    resultado = bulk_create_foods(filas)
+
+    assert resultado["created"] == 500
+    assert [(e["index"], e["name"]) for e in resultado["errors"]] == [
+        (500, "Alimento 3"), (501, "Ajo"), (502, "Sin nutrientes"), (503, "Negativo")
+    ]
+    assert sum(sql.startswith("INSERT INTO foods") for sql in query_counter) == 1
+    # Solo se comprueban los nombres del lote, en tandas de BULK_NAME_CHECK_BATCH_SIZE
+    comprobaciones = [sql for sql in query_counter if sql.startswith("SELECT foods.name")]
+    assert len(comprobaciones) == 2 and all("foods.name IN" in sql for sql in comprobaciones)
+    assert len(get_foods()) == 501
+
+
+def test_get_foods_page_keyset_and_fields(test_db, query_counter):
+    nutrientes = {"kcal": 10, "protein_g": 1, "fat_g": 0, "carbs_g": 2}
+    bulk_create_foods([{"name": f"Alimento {i}", "nutrients": nutrientes} for i in range(25)])
+
+    ids, after_id = [], None
+    while True:
+        pagina = get_foods_page(after_id=after_id, limit=10, fields="id,name")
+        if not pagina:
+            break
+        assert all(set(f) == {"id", "name"} for f in pagina)
+        ids += [f["id"] for f in pagina]
+        after_id = pagina[-1]["id"]
+
+    assert ids == sorted(ids) and len(set(ids)) == 25
+    query_counter.clear()
+    get_foods_page(fields="name")
+    assert "kcal" not in query_counter[0]
+    with pytest.raises(ValueError):
+        get_foods_page(fields="id,precio")
+
+
+def test_search_foods_ranges_category_and_sort(test_db):
+    crear_alimentos_base()
+    bulk_create_foods([
+        {"name": "Pechuga de pollo", "category": "Carnes", "nutrients": {"kcal": 110, "protein_g": 23, "fat_g": 1.5, "carbs_g": 0}},
+        {"name": "Atún al natural", "category": "Pescados", "nutrients": {"kcal": 99, "protein_g": 24, "fat_g": 1, "carbs_g": 0}},
+        {"name": "Lomo de cerdo", "category": "Carnes", "nutrients": {"kcal": 150, "protein_g": 21, "fat_g": 7, "carbs_g": 0}},
+    ])
+
+    ligeros = search_foods({"protein_g": (20, None), "kcal": (None, 120)}, sort="-protein_g", fields="name")
+    assert ligeros == [{"name": "Atún al natural"}, {"name": "Pechuga de pollo"}]
+    carnes = search_foods(category="Carnes", sort="kcal")
+    assert [f["name"] for f in carnes] == ["Pechuga de pollo", "Lomo de cerdo"]
+    assert carnes[0]["nutrients"]["protein_g"] == 23
+    assert len(search_foods(sort="-kcal", limit=2)) == 2
+
+    for argumentos in ({"sort": "precio"}, {"ranges": {"sodio": (0, 1)}}, {"ranges": {"kcal": (100, 50)}}):
+        with pytest.raises(ValueError):
+            search_foods(**argumentos)
+
+
+def test_search_foods_without_fts_ignores_accents(test_db):
+    nutrientes = {"kcal": 100, "protein_g": 1, "fat_g": 1, "carbs_g": 1}
+    bulk_create_foods([
+        {"name": nombre, "nutrients": nutrientes} for nombre in ["Plátano", "Piña", "Pan de trigo, blanco"]
+    ])
+    if test_db.dialect.name == "sqlite":
+        # Sin las tablas FTS5 (p. ej. un SQLite compilado sin ellas) se usa la búsqueda por subcadena
+        with test_db.begin() as conn:
+            conn.execute(text("DROP TABLE foods_fts"))
+            conn.execute(text("DROP TABLE foods_trigram"))
+
+    def nombres(q):
+        return [f["name"] for f in search_foods(q=q, fields="name")]
+
+    assert nombres("platano") == nombres("PLÁT") == ["Plátano"]
+    assert nombres("PINA") == nombres("piña") == ["Piña"]
+    assert nombres("trigo pan") == ["Pan de trigo, blanco"]
+    assert nombres("100%") == []
+
+
+def test_search_foods_uses_nutrient_index(test_db):
+    if test_db.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN es propio de SQLite")
+    with test_db.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id, name FROM foods WHERE protein_g >= 20 ORDER BY protein_g DESC, id LIMIT 50"
+        )).fetchall()
+    assert any("ix_foods_protein_g" in row[-1] for row in plan)
+
+
+def test_search_foods_text_without_accents_prefix_and_typos(test_db):
+    if test_db.dialect.name != "sqlite":
+        pytest.skip("La búsqueda de texto usa FTS5 de SQLite")
+    nutrientes = {"kcal": 100, "protein_g": 1, "fat_g": 1, "carbs_g": 1}
+    bulk_create_foods([
+        {"name": nombre, "category": categoria, "nutrients": nutrientes}
+        for nombre, categoria in [
+            ("Calamar, Sepia", "Pescados"), ("Pan de trigo, blanco", "Cereales"),
+            ("Plátano", "Frutas"), ("Piña", "Frutas"), ("Pechuga de pollo", "Carnes"),
+        ]
+    ])
+
+    def nombres(q, **kwargs):
+        return [f["name"] for f in search_foods(q=q, fields="name", **kwargs)]
+
+    assert nombres("platano") == ["Plátano"]
+    assert nombres("PIÑA") == nombres("pina") == ["Piña"]
+    assert nombres("pan trig") == ["Pan de trigo, blanco"]
+    assert nombres("calamr") == ["Calamar, Sepia"]
+    assert sorted(nombres("frutas")) == ["Piña", "Plátano"]
+    assert nombres("frutas", ranges={"kcal": (None, 50)}) == []
+    assert nombres("xyz") == []
+
+    # Los triggers mantienen el índice al actualizar y borrar
+    platano = search_foods(q="platano", fields="id")[0]
+    update_food(platano["id"], Food(name="Banana", category="Frutas", nutrients=nutrientes))
+    assert nombres("platano") == [] and nombres("bana") == ["Banana"]
+    delete_food(platano["id"])
+    assert nombres("banana") == []
+
+    with pytest.raises(ValueError, match="Pan de trigo, blanco"):
+        create_recipe(Recipe(name="Tostada", description="", ingredient_quantities={"pan de trigo": 60}))
+
+
+# -------------------- CACHÉ DE ALIMENTOS --------------------
+
+def test_food_catalog_resolves_ingredients_without_querying_foods(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(1)
+    cargas = food_catalog.stats()["loads"]
+
+    query_counter.clear()
+    crear_recetas(1, inicio=1)
+    # Nombres y nutrientes de los 3 ingredientes desde la caché: solo se lee la versión de "foods"
+    assert not [sql for sql in query_counter if "FROM foods" in sql]
+    assert food_catalog.stats()["loads"] == cargas
+    assert food_catalog.stats()["hits"] >= 6
+
+
+def test_food_catalog_uses_nutrients_changed_by_other_process(test_db, other_process):
+    crear_alimentos_base()
+    db_config.load_food_catalog()
+
+    other_process("update_food(1, Food(name='Tomate', nutrients=Nutrients(kcal=99, protein_g=1, fat_g=0, carbs_g=4)))")
+    create_recipe(Recipe(name="Tomate solo", description="", ingredient_quantities={"Tomate": 100}))
+    receta = get_recipes_with_ingredients(fields="name,nutrients")[-1]
+    assert receta["nutrients"]["kcal"] == 99
+
+    # Renombrado fuera: el nombre antiguo ya no resuelve y el nuevo se busca por nombre
+    other_process("update_food(2, Food(name='Ajo morado', nutrients=Nutrients(kcal=140, protein_g=7, fat_g=0, carbs_g=28)))")
+    with get_db() as db:
+        assert food_catalog.get(db, "Ajo") is None
+        assert food_catalog.get(db, "Ajo morado").nutrients["kcal"] == 140
+
+
+def test_food_catalog_write_through(test_db):
+    fallos = food_catalog.stats()["misses"]
+    tomate = create_food(Food(name="Tomate", nutrients=Nutrients(kcal=22, protein_g=1, fat_g=0, carbs_g=4)))
+    with get_db() as db:
+        assert food_catalog.get(db, "Tomate").nutrients["kcal"] == 22
+
+        update_food(tomate.id, Food(name="Tomate pera", nutrients=Nutrients(kcal=20, protein_g=1, fat_g=0, carbs_g=4)))
+        assert food_catalog.get(db, "Tomate") is None
+        assert food_catalog.get(db, "Tomate pera").nutrients["kcal"] == 20
+
+        delete_food(tomate.id)
+        assert food_catalog.get(db, "Tomate pera") is None
+    assert food_catalog.stats()["misses"] - fallos == 2
+
+
+def test_food_catalog_applies_only_committed_writes(test_db):
+    crear_alimentos_base()
+    db_config.load_food_catalog()
+    cargas = food_catalog.stats()["loads"]
+
+    # Dentro de la transacción se ven los cambios sin commit; tras el rollback no quedan en la caché
+    with get_db() as db:
+        tomate = db.query(db_config.FoodDB).filter_by(name="Tomate").one()
+        tomate.nutrients = db_config.FoodNutrientValues.of({"kcal": 99, "protein_g": 1, "fat_g": 0, "carbs_g": 4})
+        db.flush()
+        assert food_catalog.get(db, "Tomate").nutrients["kcal"] == 99
+        db.rollback()
+        assert food_catalog.get(db, "Tomate").nutrients["kcal"] == 22
+    assert food_catalog.stats()["loads"] == cargas
+
+    # Un insert() masivo no deja filas que aplicar: la caché se recarga en el siguiente uso
+    bulk_create_foods([{"name": "Pepino", "nutrients": {"kcal": 15, "protein_g": 1, "fat_g": 0, "carbs_g": 3}}])
+    with get_db() as db:
+        assert food_catalog.get(db, "Pepino").nutrients["kcal"] == 15
+    assert food_catalog.stats()["loads"] == cargas + 1
+
+
+def test_autocomplete_from_catalog_reading_only_version(test_db, query_counter):
+    crear_alimentos_base()
+    nutrientes = Nutrients(kcal=100, protein_g=1, fat_g=1, carbs_g=1)
+    platano = create_food(Food(name="Plátano", nutrients=nutrientes))
+    create_food(Food(name="Pan de trigo, blanco", nutrients=nutrientes))
+    db_config.load_food_catalog()
+
+    def nombres(prefijo, limite=10):
+        return [f["name"] for f in db_config.autocomplete_foods(prefijo, limite)]
+
+    query_counter.clear()
+    assert nombres("PLAT") == nombres("plát") == ["Plátano"]
+    # Primero los nombres que empiezan por el prefijo y después los que lo tienen en otra palabra
+    assert nombres("t") == ["Tomate", "Pan de trigo, blanco"]
+    assert nombres("de") == ["Aceite de oliva", "Pan de trigo, blanco"]
+    assert nombres("a", 1) == ["Aceite de oliva"]
+    assert nombres("x") == []
+    assert all("FROM table_versions" in sql for sql in query_counter)
+    with pytest.raises(ValueError):
+        nombres("  ")
+
+    # Las escrituras de este proceso avanzan la versión sin recargar el catálogo
+    cargas = food_catalog.stats()["loads"]
+    update_food(platano.id, Food(name="Banana", nutrients=nutrientes))
+    assert nombres("pla") == [] and nombres("ban") == ["Banana"]
+    delete_food(platano.id)
+    assert nombres("ban") == []
+    assert food_catalog.stats()["loads"] == cargas
+
+
+def test_autocomplete_sees_foods_created_by_other_process(test_db, other_process):
+    crear_alimentos_base()
+    assert db_config.autocomplete_foods("Pep") == []
+
+    other_process("create_food(Food(name='Pepino', nutrients=Nutrients(kcal=15, protein_g=1, fat_g=0, carbs_g=3)))")
+    assert [f["name"] for f in db_config.autocomplete_foods("Pep")] == ["Pepino"]
+
+
+def test_autocomplete_concurrent_with_reloads(test_db):
+    crear_alimentos_base()
+    db_config.load_food_catalog()
+    errores, parar = [], threading.Event()
+
+    def sugerir():
+        while not parar.is_set():
+            try:
+                assert [f["name"] for f in db_config.autocomplete_foods("tom")] == ["Tomate"]
+            except Exception as e:
+                errores.append(e)
+                return
+
+    # Cambios de hilo muy frecuentes para que las recargas se intercalen con las búsquedas
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    hilos = [threading.Thread(target=sugerir) for _ in range(4)]
+    try:
+        for hilo in hilos:
+            hilo.start()
+        # Escrituras de otro proceso (suben la versión y obligan a recargar) e invalidaciones
+        for i in range(200):
+            with test_db.begin() as conn:
+                conn.execute(text("UPDATE table_versions SET version = version + 1 WHERE table_name = 'foods'"))
+            if i % 10 == 0:
+                food_catalog.invalidate()
+    finally:
+        parar.set()
+        for hilo in hilos:
+            hilo.join()
+        sys.setswitchinterval(intervalo)
+    assert errores == []
+    assert food_catalog.stats()["loads"] > 1
+
+
+# -------------------- RECETAS --------------------
+
+def test_get_recipe_with_ingredients(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+
+    receta = get_recipes_with_ingredients()[0]
+    assert receta["name"] == "Salsa 0"
+    assert {i["food_name"] for i in receta["ingredients"]} == {"Tomate", "Ajo", "Aceite de oliva"}
+    assert get_recipe_with_ingredients(receta["id"]) == receta
+
+
+def test_get_recipes_with_ingredients_query_count(test_db, query_counter):
+    crear_alimentos_base()
+
+    crear_recetas(1)
+    query_counter.clear()
+    get_recipes_with_ingredients()
+    consultas_una_receta = len(query_counter)
+
+    crear_recetas(20, inicio=1)
+    query_counter.clear()
+    recetas = get_recipes_with_ingredients()
+
+    assert len(recetas) == 21
+    assert all(len(r["ingredients"]) == 3 for r in recetas)
+    assert len(query_counter) == consultas_una_receta == 2
+
+
+def test_recipes_projection_skips_ingredients(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(5)
+
+    query_counter.clear()
+    recetas = get_recipes_with_ingredients(limit=2, fields="id,name,nutrients")
+    assert len(query_counter) == 1
+    assert [set(r) for r in recetas] == [{"id", "name", "nutrients"}] * 2
+
+    siguientes = get_recipes_with_ingredients(after_id=recetas[-1]["id"], fields="name,ingredients")
+    assert [r["name"] for r in siguientes] == ["Salsa 2", "Salsa 3", "Salsa 4"]
+    assert all(len(r["ingredients"]) == 3 for r in siguientes)
+
+
+
+def test_get_by_ids_single_query_keyed_by_id(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(5)
+    ids_alimentos = [f["id"] for f in get_foods_page(fields="id")]
+
+    query_counter.clear()
+    alimentos = get_foods_by_ids([ids_alimentos[2], 999, ids_alimentos[0], ids_alimentos[2]], fields="name")
+    assert len(query_counter) == 1 and " IN " in query_counter[0]
+    assert alimentos == {ids_alimentos[2]: {"name": "Aceite de oliva"}, ids_alimentos[0]: {"name": "Tomate"}}
+
+    query_counter.clear()
+    recetas = get_recipes_by_ids([4, 2], fields="id,name")
+    assert len(query_counter) == 1
+    assert recetas == {4: {"id": 4, "name": "Salsa 3"}, 2: {"id": 2, "name": "Salsa 1"}}
+
+    completas = get_recipes_by_ids([5, 1])
+    assert list(completas) == [5, 1]
+    assert completas[1] == get_recipe_with_ingredients(1)
+    assert get_recipes_by_ids([]) == {}
+
+# -------------------- COMIDAS --------------------
+
+def test_get_meals_with_items_query_count(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(1)
+
+    crear_comidas(1)
+    query_counter.clear()
+    get_meals_with_items()
+    consultas_una_comida = len(query_counter)
+
+    crear_comidas(30)
+    query_counter.clear()
+    comidas = get_meals_with_items()
+
+    assert len(comidas) == 31
+    assert len(query_counter) == consultas_una_comida == 2
+
+    comida = comidas[0]
+    assert set(comida) == {"id", "meal_date", "nutrients", "items"}
+    assert sorted((i["component_type"], i["quantity"]) for i in comida["items"]) == [
+        ("food", 5.0), ("food", 100.0), ("recipe", 100.0)
+    ]
+    assert get_meal_with_items(comida["id"]) == comida
+
+
+def test_expanded_meal_components_in_one_query(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(1)
+    crear_comidas(20)
+    pepino = create_food(Food(name="Pepino", nutrients=Nutrients(kcal=15, protein_g=1, fat_g=0, carbs_g=3)))
+    comida_pepino = create_meal(Meal(meal_date=date(2025, 5, 29), recipes=[], foods=[{"Pepino": 200}]))
+
+    query_counter.clear()
+    comidas = get_meals_with_items(expand=True)
+    assert len(comidas) == 21
+    assert len(query_counter) == 2 and "JOIN foods" in query_counter[1] and "JOIN recipes" in query_counter[1]
+
+    comida = comidas[0]
+    componentes = {i["name"]: i for i in comida["items"]}
+    assert set(componentes) == {"Salsa 0", "Ajo", "Tomate"}
+    assert componentes["Ajo"]["nutrients"]["kcal"] == pytest.approx(139 * 5 / 100)
+    assert componentes["Salsa 0"]["nutrients"]["kcal"] == pytest.approx(22 * 5 + 139 * 0.1 + 900 * 0.2)
+    for key, total in comida["nutrients"].items():
+        assert sum(i["nutrients"][key] for i in comida["items"]) == pytest.approx(total)
+
+    # Sin expandir, los mismos items sin nombre ni nutrientes
+    normal = get_meal_with_items(comida["id"])
+    assert [{k: i[k] for k in ("component_type", "component_id", "quantity")} for i in comida["items"]] == normal["items"]
+
+    assert get_meals_in_range(date(2025, 5, 29), date(2025, 5, 29), expand=True)[0]["items"][0]["nutrients"]["kcal"] == 30
+    delete_food(pepino.id)
+    borrado = get_meal_with_items(comida_pepino.id, expand=True)["items"][0]
+    assert borrado["name"] is None and borrado["nutrients"] is None
+    with pytest.raises(ValueError):
+        get_meals_in_range(fields="id,nutrients", expand=True)
+
+
+def test_get_meals_in_range(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+    for dia in range(1, 15):
+        crear_comidas(1, fecha=date(2025, 6, dia))
+
+    comidas = get_meals_in_range(date(2025, 6, 2), date(2025, 6, 8))
+
+    assert [c["meal_date"] for c in comidas] == [date(2025, 6, d) for d in range(2, 9)]
+    assert len(get_meals_in_range(start=date(2025, 6, 10))) == 5
+    assert len(get_meals_in_range(end=date(2025, 6, 3))) == 3
+
+
+def test_meals_range_uses_meal_date_index(test_db):
+    if test_db.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN es propio de SQLite")
+    with test_db.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM meals "
+            "WHERE meal_date >= '2025-06-02' AND meal_date <= '2025-06-08' ORDER BY meal_date, id"
+        )).fetchall()
+    assert any("ix_meals_meal_date_id" in row[-1] for row in plan)
+
+
+# -------------------- ESTADÍSTICAS --------------------
+
+def test_daily_and_weekly_nutrient_totals(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+    # Lunes 2 y martes 3 de junio (dos comidas el martes) y lunes 9 de junio
+    crear_comidas(1, fecha=date(2025, 6, 2))
+    crear_comidas(2, fecha=date(2025, 6, 3))
+    crear_comidas(1, fecha=date(2025, 6, 9))
+    kcal_comida = get_meals_with_items()[0]["nutrients"]["kcal"]
+
+    diarios = get_daily_nutrient_totals(date(2025, 6, 1), date(2025, 6, 8))
+    assert [(d["meal_date"], d["meals"]) for d in diarios] == [(date(2025, 6, 2), 1), (date(2025, 6, 3), 2)]
+    assert diarios[1]["nutrients"]["kcal"] == pytest.approx(2 * kcal_comida)
+
+    semanales = get_weekly_nutrient_totals()
+    assert [(s["week_start"], s["days"], s["meals"]) for s in semanales] == [
+        (date(2025, 6, 2), 2, 3), (date(2025, 6, 9), 1, 1)
+    ]
+    assert semanales[0]["nutrients"]["kcal"] == pytest.approx(3 * kcal_comida)
+
+
+def test_daily_totals_follow_meal_writes(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+    crear_comidas(2, fecha=date(2025, 6, 2))
+    comida_id = get_meals_with_items()[0]["id"]
+
+    # Mover una comida a otro día y cambiar sus componentes
+    update_meal(comida_id, Meal(meal_date=date(2025, 6, 4), recipes=[], foods=[{"Tomate": 200}]))
+    diarios = {d["meal_date"]: d for d in get_daily_nutrient_totals()}
+    assert diarios[date(2025, 6, 2)]["meals"] == 1
+    assert diarios[date(2025, 6, 4)]["meals"] == 1
+    assert diarios[date(2025, 6, 4)]["nutrients"]["kcal"] == pytest.approx(44)
+
+    delete_meal(comida_id)
+    assert [d["meal_date"] for d in get_daily_nutrient_totals()] == [date(2025, 6, 2)]
+
+    # El resumen incremental coincide con la reconstrucción completa
+    incremental = get_daily_nutrient_totals()
+    assert rebuild_daily_nutrient_totals() == 1
+    reconstruido = get_daily_nutrient_totals()
+    assert reconstruido[0]["meals"] == incremental[0]["meals"]
+    for key, value in incremental[0]["nutrients"].items():
+        assert reconstruido[0]["nutrients"][key] == pytest.approx(value)
+
+
+def test_update_food_recomputes_only_dependents(test_db, query_counter):
+    crear_alimentos_base()
+    crear_recetas(2)
+    create_recipe(Recipe(name="Aliño", description="", ingredient_quantities={"Aceite de oliva": 10}))
+    crear_comidas(2, fecha=date(2025, 6, 2))
+    create_meal(Meal(meal_date=date(2025, 6, 3), recipes=["Aliño"], foods=[]))
+    ajo = next(f for f in get_foods() if f.name == "Ajo")
+
+    # Solo cambia el nombre: no hay nada que recalcular
+    actualizado = update_food(ajo.id, Food(name="Ajo morado", nutrients=Nutrients(kcal=139, protein_g=7, fat_g=0, carbs_g=28)))
+    assert actualizado.recomputed == {"recipes": 0, "meals": 0, "days": 0}
+
+    query_counter.clear()
+    actualizado = update_food(ajo.id, Food(name="Ajo morado", nutrients=Nutrients(kcal=150, protein_g=7, fat_g=0, carbs_g=30)))
+    # Salsa 0 y Salsa 1 llevan ajo; las dos comidas del día 2 llevan Salsa 0 y ajo; Aliño y el día 3 no cambian
+    assert actualizado.recomputed == {"recipes": 2, "meals": 2, "days": 1}
+    # Un UPDATE por tabla para todas las filas afectadas
+    assert sum(sql.startswith("UPDATE recipes") for sql in query_counter) == 1
+    assert sum(sql.startswith("UPDATE meals") for sql in query_counter) == 1
+
+    recetas = {r["id"]: r["nutrients"] for r in get_recipes_with_ingredients()}
+    for recipe_id, nutrients in compute_recipes_nutrients().items():
+        assert recetas[recipe_id] == pytest.approx(nutrients)
+    comidas = {c["id"]: c["nutrients"] for c in get_meals_with_items()}
+    for meal_id, nutrients in compute_meals_nutrients().items():
+        assert comidas[meal_id] == pytest.approx(nutrients)
+
+    incremental = get_daily_nutrient_totals()
+    rebuild_daily_nutrient_totals()
+    for antes, despues in zip(incremental, get_daily_nutrient_totals()):
+        assert antes["meals"] == despues["meals"]
+        assert antes["nutrients"] == pytest.approx(despues["nutrients"])
+
+
+def test_meals_pagination_and_projection(test_db):
+    crear_alimentos_base()
+    crear_recetas(1)
+    for dia in (5, 1, 3):
+        crear_comidas(1, fecha=date(2025, 6, dia))
+
+    pagina = get_meals_in_range(limit=2, fields="id,meal_date")
+    assert [c["meal_date"] for c in pagina] == [date(2025, 6, 5), date(2025, 6, 1)]
+    resto = get_meals_in_range(after_id=pagina[-1]["id"], fields=["id", "items"])
+    assert len(resto) == 1 and len(resto[0]["items"]) == 3
+
+
+# -------------------- EXPORTACIÓN --------------------
+
+def test_exports_stream_in_batches(test_db, monkeypatch):
+    monkeypatch.setattr(db_config, "EXPORT_BATCH_SIZE", 4)
+    crear_alimentos_base()
+    crear_recetas(10)
+    crear_comidas(9)
+
+    exportadas = list(iter_recipes_export())
+    assert exportadas == get_recipes_with_ingredients()
+    assert [c["id"] for c in iter_meals_export()] == [c["id"] for c in get_meals_with_items()]
+    assert [f["name"] for f in iter_foods_export()] == ["Tomate", "Ajo", "Aceite de oliva"]
@@ -0,0 +1,87 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import update
+
+from db_config import JobDB, JobStatusEnum, RecipeDB, create_job, update_job, get_db, get_job, get_recipes_with_ingredients, get_daily_nutrient_totals, get_foods
+from test_db_config import crear_alimentos_base, crear_recetas, crear_comidas
+import jobs
+
+
+def test_recompute_job_runs_in_background_and_reports_progress(test_db, monkeypatch):
+    crear_alimentos_base()
+    crear_recetas(3)
+    crear_comidas(4, fecha=date(2025, 6, 2))
+    correctas = {r["id"]: r["nutrients"] for r in get_recipes_with_ingredients()}
+    # Nutrientes guardados desfasados
+    with get_db() as db:
+        db.execute(update(RecipeDB).values(kcal=0))
+        db.commit()
+
+    progreso = []
+    real = jobs.update_job
+    monkeypatch.setattr(jobs, "update_job", lambda job_id, **values: (progreso.append(values.get("progress")), real(job_id, **values)))
+
+    trabajo = jobs.submit_job("recompute_nutrients", {"batch_size": 2})
+    assert trabajo["status"] == "pending"
+    jobs.shutdown()  # Espera a que termine
+
+    trabajo = get_job(trabajo["id"])
+    assert trabajo["status"] == "done" and trabajo["progress"] == 1
+    assert trabajo["result"] == {"recipes": 3, "meals": 4, "days": 1}
+    assert trabajo["started_at"] is not None and trabajo["finished_at"] is not None
+    # Un avance por lote: 2 de recetas y 2 de comidas sobre 7 filas
+    assert [p for p in progreso if p is not None][:4] == pytest.approx([2 / 7, 3 / 7, 5 / 7, 1])
+    for receta in get_recipes_with_ingredients():
+        assert receta["nutrients"] == pytest.approx(correctas[receta["id"]])
+    assert get_daily_nutrient_totals()[0]["meals"] == 4
+
+
+def test_failed_and_unknown_jobs(test_db):
+    crear_alimentos_base()
+    importacion = jobs.submit_job("import_foods", {"foods": [
+        {"name": "Cebolla", "nutrients": {"kcal": 40, "protein_g": 1, "fat_g": 0, "carbs_g": 9}},
+        {"name": "Tomate", "nutrients": {"kcal": 22, "protein_g": 1, "fat_g": 0, "carbs_g": 4}},
+    ]})
+    sin_datos = jobs.submit_job("import_foods")
+    jobs.shutdown()
+
+    resultado = get_job(importacion["id"])["result"]
+    assert resultado["created"] == 1 and len(resultado["errors"]) == 1
+    # Las filas no se guardan en el trabajo, solo cuántas eran
+    assert importacion["params"] == get_job(importacion["id"])["params"] == {"foods": {"rows": 2}}
+    assert "Cebolla" in {f.name for f in get_foods()}
+    fallido = get_job(sin_datos["id"])
+    assert fallido["status"] == "failed" and "foods" in fallido["error"]
+
+    with pytest.raises(ValueError):
+        jobs.submit_job("borrar_todo")
+    assert get_job(999) is None
+
+
+def test_final_status_write_failure_marks_job_failed(test_db, monkeypatch):
+    # El resultado no se puede guardar como JSON: el trabajo no puede quedarse en "running"
+    monkeypatch.setitem(jobs.JOB_KINDS, "no_serializable", lambda params, progress: {"fecha": object()})
+    trabajo = jobs.submit_job("no_serializable")
+    jobs.shutdown()
+
+    fallido = get_job(trabajo["id"])
+    assert fallido["status"] == "failed" and fallido["error"] and fallido["finished_at"] is not None
+
+
+def test_stale_jobs_are_failed_on_startup(test_db, monkeypatch):
+    abandonado = create_job("rebuild_totals")
+    en_marcha = create_job("rebuild_totals")
+    update_job(abandonado["id"], status=JobStatusEnum.running)
+    # Último latido muy antiguo: su proceso ya no existe
+    with get_db() as db:
+        db.execute(update(JobDB).where(JobDB.id == abandonado["id"]).values(heartbeat_at=datetime(2000, 1, 1)))
+        db.commit()
+
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 3600)
+    jobs.start()
+    jobs.shutdown()
+
+    assert get_job(abandonado["id"])["status"] == "failed"
+    # Con latido reciente puede ser de otro worker vivo: no se toca
+    assert get_job(en_marcha["id"])["status"] == "pending"